@@ -20,8 +20,10 @@
 # - SimpleSparkle animation (soft fade + random sparkles)
 # - Button on pin D10 cycles between 3 colors
 # - Animation + button handling each in its own class
+# - Optional /pattern.hnp (see tools/pattern_compiler.py), streamed from flash
 # -----------------------------------------------------------------------------
 
+import os
 import time
 import random
 import board
@@ -191,6 +193,25 @@ COLORS = [
     (255, 120, 0),   # warm orange
 ]
 
+PATTERN_FILE = "/pattern.hnp"
+
+pattern = None
+try:
+    os.stat(PATTERN_FILE)
+except OSError:
+    pass
+else:
+    # imported only when needed: compiling the module costs RAM on the M0
+    from pattern_player import PatternPlayer
+    try:
+        pattern = PatternPlayer(pixels, PATTERN_FILE)
+    except (ValueError, OSError) as e:
+        # broken or incompatible file: keep the sparkle-only color cycle
+        print("Pattern:", PATTERN_FILE, "not loaded:", e)
+    else:
+        COLORS.append(None)  # last button step plays the pattern
+        print("Pattern:", PATTERN_FILE, pattern.frame_count, "frames")
+
 button = ButtonColorCycler(
     BUTTON_PIN,
     COLORS,
@@ -200,7 +221,7 @@ button = ButtonColorCycler(
 
 sparkle = SimpleSparkle(
     pixels,
-    color=button.color,
+    color=COLORS[0],
     speed=0.02,
     sparkles_per_frame=3,
     fade=220,
@@ -213,6 +234,12 @@ sparkle = SimpleSparkle(
 while True:
     # Update button, change sparkle color on press
     if button.update():
-        sparkle.color = button.color
-
-    sparkle.animate()
+        if button.color is None:
+            pattern.rewind()
+        else:
+            sparkle.color = button.color
+
+    if button.color is None:
+        pattern.animate()
+    else:
+        sparkle.animate()
@@ -0,0 +1,178 @@
+# pattern_player.py
+# Version 1.0
+#
+# Plays compiled pattern files (.hnp) from CIRCUITPY flash.
+# The file is streamed in small fixed-size chunks, never loaded whole,
+# so long patterns fit the RAM of the ItsyBitsy M0.
+# Create pattern files with tools/pattern_compiler.py.
+#
+# File layout (little-endian):
+#   header   "HNPT", version, flags, pixels (u16), frame_ms (u16),
+#            palette entries (u16), frame count (u32)
+#   palette  entries * r, g, b
+#   frames   type (u8), length (u16), data
+#
+# Frame types (PAL variants use 1 byte palette indices instead of r, g, b):
+#   KEY      every pixel
+#   RLE      [count][pixel] ...
+#   DELTA    [skip][count][count pixels] ...   changes to the previous frame
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import time
+import struct
+
+MAGIC = b"HNPT"
+VERSION = 1
+HEADER_FORMAT = "<4sBBHHHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_SIZE = 3
+
+FLAG_LOOP = 0x01
+
+KEY = 0
+KEY_PAL = 1
+RLE = 2
+RLE_PAL = 3
+DELTA = 4
+DELTA_PAL = 5
+
+
+class PatternPlayer:
+    def __init__(self, pixel_object, path, speed=None, chunk=96):
+        self.pixels = pixel_object
+        self._f = open(path, "rb")
+
+        header = self._f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[0:4] != MAGIC or header[4] != VERSION:
+            self._f.close()
+            raise ValueError("not a pattern file")
+        magic, version, flags, pixels, frame_ms, entries, frames = struct.unpack(
+            HEADER_FORMAT, header
+        )
+
+        self.loop = bool(flags & FLAG_LOOP)
+        self.frame_count = frames
+        self.num_pixels = min(pixels, len(self.pixels))
+        self.speed = frame_ms / 1000 if speed is None else speed
+
+        self._palette = bytearray(entries * 3)
+        if entries:
+            self._f.readinto(self._palette)
+        self._data_start = HEADER_SIZE + entries * 3
+
+        self._buf = bytearray(chunk)
+        self._mv = memoryview(self._buf)
+        self._rec = bytearray(RECORD_SIZE)
+        self._pos = 0
+        self._end = 0
+        self._remaining = 0
+        self._last = 0.0
+
+    def close(self):
+        self._f.close()
+
+    def rewind(self):
+        self._f.seek(self._data_start)
+
+    # ---- chunked reading ----
+
+    def _need(self, k):
+        """Make sure k unread bytes of the current frame are in the chunk."""
+        left = self._end - self._pos
+        if left >= k:
+            return True
+        if left:
+            self._buf[0:left] = self._mv[self._pos:self._end]
+        want = len(self._buf) - left
+        if want > self._remaining:
+            want = self._remaining
+        got = self._f.readinto(self._mv[left:left + want]) if want else 0
+        self._remaining -= got
+        self._pos = 0
+        self._end = left + got
+        return self._end >= k
+
+    def _skip_rest(self):
+        self._f.seek(self._remaining, 1)
+        self._remaining = 0
+        self._pos = self._end = 0
+
+    def _next_record(self):
+        if self._f.readinto(self._rec) != RECORD_SIZE:
+            if not self.loop:
+                return None
+            self.rewind()
+            if self._f.readinto(self._rec) != RECORD_SIZE:
+                return None
+        self._remaining = self._rec[1] | (self._rec[2] << 8)
+        self._pos = self._end = 0
+        return self._rec[0]
+
+    # ---- decoding ----
+
+    def _pixel(self, pal):
+        # color of the next pixel in the chunk as 0xRRGGBB
+        b = self._buf
+        p = self._pos
+        if pal:
+            o = b[p] * 3
+            self._pos = p + 1
+            c = self._palette
+            return (c[o] << 16) | (c[o + 1] << 8) | c[o + 2]
+        self._pos = p + 3
+        return (b[p] << 16) | (b[p + 1] << 8) | b[p + 2]
+
+    def _decode(self, kind):
+        px = self.pixels
+        n = self.num_pixels
+        pal = kind & 1
+        size = 1 if pal else 3
+        i = 0
+
+        if kind <= KEY_PAL:
+            while i < n and self._need(size):
+                px[i] = self._pixel(pal)
+                i += 1
+
+        elif kind <= RLE_PAL:
+            while i < n and self._need(1 + size):
+                count = self._buf[self._pos]
+                self._pos += 1
+                c = self._pixel(pal)
+                while count and i < n:
+                    px[i] = c
+                    i += 1
+                    count -= 1
+
+        elif kind <= DELTA_PAL:
+            while self._need(2):
+                i += self._buf[self._pos]
+                count = self._buf[self._pos + 1]
+                self._pos += 2
+                while count and self._need(size):
+                    if i < n:
+                        px[i] = self._pixel(pal)
+                    else:
+                        self._pos += size
+                    i += 1
+                    count -= 1
+
+        self._skip_rest()
+
+    # ---- animation ----
+
+    def animate(self):
+        now = time.monotonic()
+        if (now - self._last) < self.speed:
+            return False
+        self._last = now
+
+        kind = self._next_record()
+        if kind is None:
+            return False
+        self._decode(kind)
+
+        self.pixels.show()
+        return True
@@ -0,0 +1,222 @@
+# pattern_compiler.py
+#
+# Host-side compiler for pattern files (.hnp) played by
+# lib/pattern_player.py. Turns a scripted animation (Python file) or a
+# recorded one (raw RGB frames) into palette + key frames + per frame
+# deltas, choosing the smallest encoding for every frame.
+#
+# Script input: a Python file defining
+#   FRAMES          number of frames
+#   FRAME_MS        frame time in ms (optional, default 50)
+#   PIXELS          pixel count (optional, default 132)
+#   frame(n)        -> list of (r, g, b) per pixel
+#
+# Usage:
+#   python3 pattern_compiler.py pattern_example.py -o pattern.hnp --check
+#   python3 pattern_compiler.py --raw capture.rgb --pixels 132 --frame-ms 33 -o pattern.hnp
+#
+# Copy the .hnp file to CIRCUITPY as /pattern.hnp.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import os
+import runpy
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from pattern_player import (  # noqa: E402
+    MAGIC, VERSION, HEADER_FORMAT, FLAG_LOOP,
+    KEY, KEY_PAL, RLE, RLE_PAL, DELTA, DELTA_PAL,
+    PatternPlayer,
+)
+
+MAX_RECORD = 0xFFFF
+
+
+# -----------------------------------------------------------------------------
+# Frame encodings (units are pixels: 3 bytes r, g, b or 1 byte palette index)
+# -----------------------------------------------------------------------------
+
+def _units(frame, index):
+    """Frame as a list of per pixel units (bytes objects)."""
+    if index is None:
+        return [frame[i:i + 3] for i in range(0, len(frame), 3)]
+    return [bytes((index[frame[i:i + 3]],)) for i in range(0, len(frame), 3)]
+
+
+def enc_key(units):
+    return b"".join(units)
+
+
+def enc_rle(units):
+    out = bytearray()
+    i = 0
+    while i < len(units):
+        j = i + 1
+        while j < len(units) and j - i < 255 and units[j] == units[i]:
+            j += 1
+        out.append(j - i)
+        out += units[i]
+        i = j
+    return bytes(out)
+
+
+def enc_delta(prev, units):
+    out = bytearray()
+    i = 0
+    skip = 0
+    n = len(units)
+    while i < n:
+        if units[i] == prev[i]:
+            skip += 1
+            i += 1
+            continue
+        while skip > 255:
+            out += bytes((255, 0))
+            skip -= 255
+        start = i
+        while i < n and i - start < 255 and units[i] != prev[i]:
+            i += 1
+        out += bytes((skip, i - start))
+        out += b"".join(units[start:i])
+        skip = 0
+    return bytes(out)
+
+
+def compile_pattern(frames, pixels, frame_ms, *, loop=True, keyframe_every=0):
+    colors = sorted({f[i:i + 3] for f in frames for i in range(0, len(f), 3)})
+    index = {c: k for k, c in enumerate(colors)} if len(colors) <= 256 else None
+    palette = b"".join(colors) if index is not None else b""
+
+    out = bytearray(struct.pack(
+        HEADER_FORMAT, MAGIC, VERSION, FLAG_LOOP if loop else 0,
+        pixels, frame_ms, len(palette) // 3, len(frames)
+    ))
+    out += palette
+
+    stats = {}
+    prev_rgb = prev_pal = None
+    for n, frame in enumerate(frames):
+        rgb = _units(frame, None)
+        pal = _units(frame, index) if index is not None else None
+
+        candidates = [(KEY, enc_key(rgb)), (RLE, enc_rle(rgb))]
+        if pal is not None:
+            candidates += [(KEY_PAL, enc_key(pal)), (RLE_PAL, enc_rle(pal))]
+        if n and not (keyframe_every and n % keyframe_every == 0):
+            candidates.append((DELTA, enc_delta(prev_rgb, rgb)))
+            if pal is not None:
+                candidates.append((DELTA_PAL, enc_delta(prev_pal, pal)))
+
+        kind, data = min(candidates, key=lambda c: len(c[1]))
+        if len(data) > MAX_RECORD:
+            raise ValueError(f"frame {n} too large ({len(data)} bytes)")
+        out += struct.pack("<BH", kind, len(data)) + data
+        stats[kind] = stats.get(kind, 0) + 1
+        prev_rgb, prev_pal = rgb, pal
+
+    return bytes(out), stats, len(colors)
+
+
+# -----------------------------------------------------------------------------
+# Inputs
+# -----------------------------------------------------------------------------
+
+def load_script(path):
+    ns = runpy.run_path(path)
+    pixels = ns.get("PIXELS", 132)
+    frame_ms = ns.get("FRAME_MS", 50)
+    frames = []
+    for n in range(ns["FRAMES"]):
+        px = ns["frame"](n)
+        if len(px) != pixels:
+            raise ValueError(f"frame {n}: {len(px)} pixels, expected {pixels}")
+        frames.append(b"".join(bytes((int(r), int(g), int(b))) for r, g, b in px))
+    return frames, pixels, frame_ms
+
+
+def load_raw(path, pixels):
+    size = pixels * 3
+    with open(path, "rb") as f:
+        data = f.read()
+    return [data[i:i + size] for i in range(0, len(data) - size + 1, size)]
+
+
+# -----------------------------------------------------------------------------
+# Check: play the result with the real player
+# -----------------------------------------------------------------------------
+
+class _Pixels:
+    def __init__(self, n):
+        self.values = [0] * n
+        self.frames = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, i, v):
+        self.values[i] = v
+
+    def show(self):
+        self.frames.append(b"".join(struct.pack(">I", v)[1:] for v in self.values))
+
+
+def check(path, frames, pixels):
+    px = _Pixels(pixels)
+    player = PatternPlayer(px, path, speed=0)
+    for _ in range(len(frames) + 1):   # one more: loops back to frame 0
+        player.animate()
+    player.close()
+    expected = frames + frames[:1] if player.loop else frames
+    bad = [n for n, (a, b) in enumerate(zip(px.frames, expected)) if a != b]
+    if bad or len(px.frames) != len(expected):
+        print("check FAILED at frames", bad[:10])
+        return False
+    print("check ok:", len(expected), "frames" + (" incl. loop" if player.loop else ""))
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile animations to .hnp pattern files")
+    ap.add_argument("script", nargs="?", help="Python animation script")
+    ap.add_argument("--raw", help="recorded raw RGB frames instead of a script")
+    ap.add_argument("--pixels", type=int, default=132)
+    ap.add_argument("--frame-ms", type=int, default=50)
+    ap.add_argument("--keyframe", type=int, default=0, help="key frame every N frames (0 = first only)")
+    ap.add_argument("--once", action="store_true", help="play once instead of looping")
+    ap.add_argument("-o", "--output", default="pattern.hnp")
+    ap.add_argument("--check", action="store_true", help="decode with pattern_player and compare")
+    args = ap.parse_args()
+
+    if args.raw:
+        frames, pixels, frame_ms = load_raw(args.raw, args.pixels), args.pixels, args.frame_ms
+    elif args.script:
+        frames, pixels, frame_ms = load_script(args.script)
+    else:
+        ap.error("script or --raw required")
+    if not frames:
+        ap.error("no frames")
+
+    data, stats, colors = compile_pattern(
+        frames, pixels, frame_ms, loop=not args.once, keyframe_every=args.keyframe
+    )
+    with open(args.output, "wb") as f:
+        f.write(data)
+
+    names = {KEY: "key", KEY_PAL: "key_pal", RLE: "rle", RLE_PAL: "rle_pal",
+             DELTA: "delta", DELTA_PAL: "delta_pal"}
+    raw = len(frames) * pixels * 3
+    print(f"{args.output}: {len(frames)} frames, {pixels} pixels, {colors} colors, "
+          f"{len(data)} bytes ({len(data) * 100 // raw} % of raw)")
+    print("  " + ", ".join(f"{names[k]} {v}" for k, v in sorted(stats.items())))
+
+    if args.check and not check(args.output, frames, pixels):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# pattern_example.py
+#
+# Example animation script for pattern_compiler.py:
+# a teal comet with a fading tail running around the strip.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+PIXELS = 132
+FRAME_MS = 40
+FRAMES = PIXELS * 2
+
+COLOR = (0, 200, 150)
+TAIL = 10
+
+
+def frame(n):
+    head = n % PIXELS
+    px = [(0, 0, 0)] * PIXELS
+    for k in range(TAIL):
+        f = (TAIL - k) / TAIL
+        px[(head - k) % PIXELS] = tuple(int(c * f) for c in COLOR)
+    return px
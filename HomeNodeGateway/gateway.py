@@ -0,0 +1,267 @@
+# gateway.py
+#
+# HomeNode gateway: one central BLE scan on the host, Shelly BLU button
+# events and InfinityCube state fanned out to MQTT.
+# Reuses the cube firmware modules shelly_ble and cube_sync from
+# ../InfinityCube/lib so addresses and packets match the cube exactly.
+#
+# Topics (prefix "homenode"):
+#   homenode/shelly/<id>/button/<n>   event, not retained
+#   homenode/shelly/<id>/state        battery, sensors, name (retained)
+#   homenode/cube/<id>/state          animation + color (retained), SYNC leaders only
+#
+# Usage:
+#   python3 gateway.py --broker localhost
+#   python3 gateway.py --simulate 500 --rate 5000 --seconds 5
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "InfinityCube", "lib"))
+
+from shelly_ble import parse_bthome, PacketFilter, BUTTON_EVENTS  # noqa: E402
+from cube_sync import beacon_from_manufacturer_data  # noqa: E402
+from transport import MemoryBroker, MemoryTransport, PahoTransport  # noqa: E402
+from sources import BleakSource, SimulatedSource  # noqa: E402
+
+
+class Gateway:
+    """Turns sightings into MQTT messages and publishes them in batches.
+
+    Button events are queued in order. State topics are coalesced: only
+    the newest payload per topic is sent with the next batch, and a
+    state is only queued when it differs from the last one delivered.
+    Nothing is published before the transport is connected; messages
+    the transport did not accept stay queued, and the delivered states
+    are replayed after every (re)connect so retained topics are complete.
+    At most max_events button events are kept, the oldest are dropped.
+    While the transport rejects messages, retries only run on poll(),
+    not on every sighting.
+    """
+
+    def __init__(self, transport, *, prefix="homenode", batch_size=500, flush_s=0.05,
+                 max_events=None):
+        self.transport = transport
+        self.prefix = prefix
+        self.batch_size = int(batch_size)
+        self.flush_s = float(flush_s)
+        self.max_events = int(max_events) if max_events else 4 * self.batch_size
+
+        self._packets = PacketFilter()
+        self._events = []
+        self._state = {}
+        self._sent_state = {}
+        self._connects = 0
+        self._stalled = False
+        self._next_flush = 0.0
+
+        self.sightings = 0
+        self.duplicates = 0
+        self.published = 0
+        self.dropped = 0
+
+    # ---- public ----
+
+    def handle(self, s):
+        self.sightings += 1
+        if s.bthome is not None:
+            self._handle_shelly(s)
+        elif s.adafruit is not None:
+            self._handle_cube(s)
+
+        if not self._stalled and len(self._events) + len(self._state) >= self.batch_size:
+            self.flush()
+
+    def poll(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        if now >= self._next_flush:
+            self._next_flush = now + self.flush_s
+            self.flush()
+
+    def flush(self):
+        transport = self.transport
+        if not transport.connected:
+            # hold state (coalesced anyway)
+            self._stalled = True
+            self._trim_events()
+            return
+        if transport.connects != self._connects:
+            self._connects = transport.connects
+            self._replay_state()
+        if not self._events and not self._state:
+            return
+
+        batch = self._events
+        for topic, payload in self._state.items():
+            batch.append((topic, payload, True))
+        self._events = []
+        self._state = {}
+
+        failed = transport.publish_many(batch)
+        self.published += len(batch) - len(failed)
+
+        # retry with the next flush; a newer state queued meanwhile wins
+        retry = set()
+        events = []
+        for m in failed:
+            topic, payload, retain = m
+            if retain:
+                retry.add(topic)
+                self._state.setdefault(topic, payload)
+            else:
+                events.append(m)
+        if events:
+            self._events = events + self._events
+        for topic, payload, retain in batch:
+            if retain and topic not in retry:
+                self._sent_state[topic] = payload
+        self._stalled = bool(failed)
+        self._trim_events()
+
+    # ---- internals ----
+
+    def _trim_events(self):
+        # keep only the newest events
+        over = len(self._events) - self.max_events
+        if over > 0:
+            del self._events[:over]
+            self.dropped += over
+
+    def _queue_state(self, topic, payload):
+        if self._sent_state.get(topic) == payload:
+            # the broker has it already, drop an older pending change
+            self._state.pop(topic, None)
+            return
+        self._state[topic] = payload
+
+    def _replay_state(self):
+        # a new session may have lost what the old one had not yet
+        # delivered; publish the last known state of every topic again
+        for topic, payload in self._sent_state.items():
+            self._state.setdefault(topic, payload)
+
+    def _handle_shelly(self, s):
+        data = parse_bthome(s.bthome)
+        if data is None:
+            return
+        if not self._packets.is_new(s.addr, data.get("packet_id")):
+            self.duplicates += 1
+            return
+
+        base = f"{self.prefix}/shelly/{s.addr.replace(':', '')}"
+        buttons = data.pop("buttons", ())
+        for n, ev in enumerate(buttons, 1):
+            if ev:
+                self._events.append((
+                    f"{base}/button/{n}",
+                    json.dumps({"event": BUTTON_EVENTS.get(ev, ev), "packet_id": data.get("packet_id")}),
+                    False,
+                ))
+
+        data.pop("packet_id", None)
+        if s.name:
+            data["name"] = s.name
+        self._queue_state(f"{base}/state", json.dumps(data, separators=(",", ":"), sort_keys=True))
+
+    def _handle_cube(self, s):
+        # only SYNC leaders advertise a beacon; other cubes send no state
+        b = beacon_from_manufacturer_data(s.adafruit)
+        if b is None:
+            return
+        _, _, _, animation, r, g, bl = b
+        self._queue_state(
+            f"{self.prefix}/cube/{s.addr.replace(':', '')}/state",
+            json.dumps({"animation": animation, "color": [r, g, bl]}, separators=(",", ":")),
+        )
+
+
+# -----------------------------------------------------------------------------
+# Runners
+# -----------------------------------------------------------------------------
+
+async def run_ble(gateway):
+    stop = asyncio.Event()
+    source = BleakSource(gateway.handle)
+    scan = asyncio.ensure_future(source.run(stop))
+    try:
+        while not scan.done():
+            gateway.poll()
+            await asyncio.sleep(gateway.flush_s)
+    finally:
+        stop.set()
+        await scan
+        gateway.flush()
+
+
+def run_simulation(gateway, devices, rate, seconds):
+    source = SimulatedSource(gateway.handle, devices=devices)
+    chunk = max(1, rate // 100)
+    start = time.monotonic()
+    end = start + seconds
+    sent = 0
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        # keep up with the requested event rate
+        due = int((now - start) * rate)
+        if due > sent:
+            n = min(chunk, due - sent)
+            source.emit(n)
+            sent += n
+        else:
+            time.sleep(0.001)
+        gateway.poll(now)
+    gateway.flush()
+    elapsed = time.monotonic() - start
+    print(f"{devices} devices, {sent} events in {elapsed:.2f} s ({sent / elapsed:.0f} events/s)")
+    print(f"sightings {gateway.sightings}, duplicates dropped {gateway.duplicates}, "
+          f"messages published {gateway.published}, events dropped {gateway.dropped}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HomeNode BLE to MQTT gateway")
+    ap.add_argument("--broker", help="MQTT broker host (default: in-process broker)")
+    ap.add_argument("--port", type=int, default=1883)
+    ap.add_argument("--username")
+    ap.add_argument("--password")
+    ap.add_argument("--pool", type=int, default=2, help="MQTT connections")
+    ap.add_argument("--prefix", default="homenode")
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--flush", type=float, default=0.05, help="flush interval in s")
+    ap.add_argument("--simulate", type=int, metavar="DEVICES", help="synthetic Shelly buttons instead of BLE")
+    ap.add_argument("--rate", type=int, default=1000, help="simulated events/s")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    if args.broker:
+        transport = PahoTransport(args.broker, args.port, pool_size=args.pool,
+                                  username=args.username, password=args.password)
+    else:
+        broker = MemoryBroker()
+        broker.subscribe(f"{args.prefix}/#", lambda t, p: None if args.simulate else print(t, p))
+        transport = MemoryTransport(broker)
+
+    transport.connect()
+    gateway = Gateway(transport, prefix=args.prefix, batch_size=args.batch, flush_s=args.flush)
+    try:
+        if args.simulate:
+            run_simulation(gateway, args.simulate, args.rate, args.seconds)
+        else:
+            asyncio.run(run_ble(gateway))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
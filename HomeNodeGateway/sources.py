@@ -0,0 +1,84 @@
+# sources.py
+#
+# Advertisement sources for the HomeNode gateway.
+# BleakSource scans the host BLE adapter once for all devices,
+# SimulatedSource generates Shelly BLU button traffic for load tests.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import random
+import struct
+
+from shelly_ble import mac_to_addr, is_shelly_name
+from cube_sync import ADAFRUIT_COMPANY_ID
+
+BTHOME_UUID_STR = "0000fcd2-0000-1000-8000-00805f9b34fb"
+
+
+class Sighting:
+    """One received advertisement, reduced to what the gateway uses."""
+
+    __slots__ = ("addr", "name", "rssi", "bthome", "adafruit")
+
+    def __init__(self, addr, name=None, rssi=None, bthome=None, adafruit=None):
+        self.addr = addr          # cube address string (see shelly_ble)
+        self.name = name
+        self.rssi = rssi
+        self.bthome = bthome      # BTHome payload (after the 0xFCD2 uuid)
+        self.adafruit = adafruit  # manufacturer data after the company id
+
+
+class BleakSource:
+    """Continuous active scan with bleak, one scanner for all devices.
+
+    Active, because Shelly devices send their name in the scan response.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def _on_detect(self, device, adv):
+        bthome = adv.service_data.get(BTHOME_UUID_STR)
+        adafruit = adv.manufacturer_data.get(ADAFRUIT_COMPANY_ID)
+        if bthome is None and adafruit is None and not is_shelly_name(adv.local_name):
+            return
+        addr = device.address
+        if len(addr) == 17:
+            addr = mac_to_addr(addr)
+        else:
+            addr = addr.lower()  # macOS: CoreBluetooth UUID instead of a MAC
+        self.callback(Sighting(addr, adv.local_name, adv.rssi, bthome, adafruit))
+
+    async def run(self, stop_event):
+        from bleak import BleakScanner
+
+        async with BleakScanner(detection_callback=self._on_detect):
+            await stop_event.wait()
+
+
+class SimulatedSource:
+    """Synthetic Shelly BLU buttons; every event is repeated like the
+    real devices do, so the duplicate filter is exercised as well."""
+
+    def __init__(self, callback, devices=200, repeats=3, seed=1):
+        self.callback = callback
+        self.repeats = int(repeats)
+        rnd = random.Random(seed)
+        self._rnd = rnd
+        self._devices = []
+        for i in range(int(devices)):
+            mac = ":".join(f"{rnd.randrange(256):02X}" for _ in range(6))
+            self._devices.append([mac_to_addr(mac), f"SBBT-002C-{i:04d}", 0])
+
+    def emit(self, events):
+        """Push `events` button events (each `repeats` times)."""
+        rnd = self._rnd
+        devices = self._devices
+        for _ in range(int(events)):
+            dev = devices[rnd.randrange(len(devices))]
+            dev[2] = (dev[2] + 1) & 0xFF
+            payload = struct.pack("<BBBBBBB", 0x44, 0x00, dev[2], 0x01, 100, 0x3A, rnd.choice((1, 2, 4)))
+            rssi = -40 - rnd.randrange(50)
+            for _ in range(self.repeats):
+                self.callback(Sighting(dev[0], dev[1], rssi, payload))
@@ -0,0 +1,153 @@
+# transport.py
+#
+# MQTT transports for the HomeNode gateway.
+# Transports are duck-typed; the gateway uses:
+#   connect()              start connecting (may return before it is up)
+#   connected              True while messages can be published
+#   connects               counts (re)connects, to replay retained state
+#   publish_many(messages) publish (topic, payload, retain) tuples and
+#                          return the ones not handed to a connection
+#   close()
+# MemoryBroker is an in-process stand-in for tests and load runs,
+# PahoTransport spreads the load over a small pool of MQTT connections.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter match with '+' and '#' wildcards."""
+    p = pattern.split("/")
+    t = topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t):
+            return False
+        if part != "+" and part != t[i]:
+            return False
+    return len(p) == len(t)
+
+
+class MemoryBroker:
+    """Minimal in-process broker: subscriptions and retained messages."""
+
+    def __init__(self):
+        self.retained = {}
+        self.published = 0
+        self._subs = []
+
+    def subscribe(self, pattern, callback):
+        self._subs.append((pattern, callback))
+        for topic, payload in self.retained.items():
+            if topic_matches(pattern, topic):
+                callback(topic, payload)
+
+    def publish(self, topic, payload, retain=False):
+        self.published += 1
+        if retain:
+            self.retained[topic] = payload
+        for pattern, callback in self._subs:
+            if topic_matches(pattern, topic):
+                callback(topic, payload)
+
+
+class MemoryTransport:
+    def __init__(self, broker):
+        self.broker = broker
+        self.connected = False
+        self.connects = 0
+
+    def connect(self):
+        self.connected = True
+        self.connects += 1
+
+    def publish_many(self, messages):
+        publish = self.broker.publish
+        for topic, payload, retain in messages:
+            publish(topic, payload, retain)
+        return ()
+
+    def close(self):
+        self.connected = False
+
+
+class PahoTransport:
+    """paho-mqtt client pool.
+
+    Messages are spread over pool_size connections by topic, so the
+    order per topic is kept while the socket work runs in parallel
+    (each client has its own network thread). connect() returns at once;
+    connected turns True with the first CONNACK. While a client is
+    (re)connecting its topics move to the next connected client; only
+    with no client up, or when paho rejects a publish, messages are
+    returned as not published.
+    """
+
+    def __init__(self, host, port=1883, *, pool_size=2, client_id="homenode-gateway",
+                 username=None, password=None, qos=0, keepalive=60):
+        self.host = host
+        self.port = int(port)
+        self.pool_size = max(1, int(pool_size))
+        self.client_id = client_id
+        self.username = username
+        self.password = password
+        self.qos = int(qos)
+        self.keepalive = int(keepalive)
+        self.connects = 0
+        self._pool = []
+
+    def connect(self):
+        import paho.mqtt.client as mqtt
+
+        api = getattr(mqtt, "CallbackAPIVersion", None)
+        for i in range(self.pool_size):
+            cid = f"{self.client_id}-{i}"
+            if api is not None:
+                client = mqtt.Client(api.VERSION2, client_id=cid)
+            else:
+                client = mqtt.Client(client_id=cid)
+            if self.username:
+                client.username_pw_set(self.username, self.password)
+            client.on_connect = self._on_connect
+            client.connect_async(self.host, self.port, self.keepalive)
+            client.loop_start()
+            self._pool.append(client)
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        # network thread; rc is an int (API v1) or a ReasonCode (v2)
+        if not getattr(rc, "is_failure", rc != 0):
+            self.connects += 1
+
+    @property
+    def connected(self):
+        for client in self._pool:
+            if client.is_connected():
+                return True
+        return False
+
+    def publish_many(self, messages):
+        pool = self._pool
+        n = len(pool)
+        qos = self.qos
+        up = [client.is_connected() for client in pool]
+        failed = []
+        for m in messages:
+            topic, payload, retain = m
+            i = hash(topic) % n
+            for _ in range(n):
+                if up[i]:
+                    break
+                i = (i + 1) % n
+            else:
+                failed.append(m)
+                continue
+            if pool[i].publish(topic, payload, qos=qos, retain=retain).rc:
+                failed.append(m)
+        return failed
+
+    def close(self):
+        for client in self._pool:
+            client.disconnect()
+            client.loop_stop()
+        self._pool = []
@@ -0,0 +1,16 @@
+# -----------------------------------------------------------------------------
+# Project:    Infinity Cube
+# File:       boot.py
+# Author:     Stephan Zehrer
+#
+# SPDX-License-Identifier: GPL-3.0-only
+#
+# Copyright (c) 2025 Stephan
+#
+# Enables the second USB serial port (usb_cdc.data) used for streaming
+# frames from the host. The REPL console stays on the first port.
+# -----------------------------------------------------------------------------
+
+import usb_cdc
+
+usb_cdc.enable(console=True, data=True)
@@ -19,13 +19,21 @@
 # Features:
 # - Button on pin D10 cycles between 3 colors
 # - BLE support 
+# - SYNC mode: several cubes phase-lock to a leader beacon
+# - Binary command protocol on the UART (next to Bluefruit Connect)
+# - Live frame streaming over BLE UART or USB serial (usb_cdc.data)
+# - Event log ring buffer, exported on usb_cdc.data in idle time
 #
 # -----------------------------------------------------------------------------
 
 
+import time
 import board
 import neopixel
 import microcontroller
+import supervisor
+import usb_cdc
+from neopixel_write import neopixel_write
 
 from adafruit_led_animation.animation.comet import Comet
 from adafruit_led_animation.animation.sparklepulse import SparklePulse
@@ -44,6 +52,12 @@ from adafruit_bluefruit_connect.button_packet import ButtonPacket
 from button_detector import ButtonDetector
 from mode_controller import ModeController
 from simple_kv_storage import SimpleKVStorage
+from cube_sync import SyncClock, FrameLock
+from sync_advertisement import CubeSyncAdvertisement
+from shelly_ble import pretty_id
+import cube_protocol as proto
+from frame_stream import FrameStream
+import event_log as elog
 
 
 # -----------------------------------------------------------------------------
@@ -60,6 +74,31 @@ uid_hex = "".join(f"{b:02X}" for b in uid)
 print("UID:", uid_hex)
 
 
+# -----------------------------------------------------------------------------
+# Event log (decode with tools/event_log_decode.py)
+# -----------------------------------------------------------------------------
+
+event_log = elog.EventLog(256, clock=supervisor.ticks_ms)
+log = event_log.log
+log(elog.EV_BOOT)
+
+LOG_EXPORT_BATCH = 16   # records per LOG frame
+LOG_EXPORT_S = 1.0      # idle export interval
+log_buf = bytearray(elog.frame_size(LOG_EXPORT_BATCH))
+log_mv = memoryview(log_buf)
+log_next_export = 0.0
+
+
+def export_log(port, everything=False):
+    while True:
+        n = event_log.export_into(log_buf, LOG_EXPORT_BATCH)
+        if not n:
+            return
+        port.write(log_mv[:n])
+        if not everything:
+            return
+
+
 # -----------------------------------------------------------------------------
 # Hardware config
 # -----------------------------------------------------------------------------
@@ -92,21 +131,32 @@ STRIP_COMET_BOUNCE = False  # Set to False to stop comet from "bouncing" on NeoP
 SPARKLE_SPEED = 0.2  # Lower numbers increase the animation speed
 
 
+sparkle_pulse = SparklePulse(strip_pixels, SPARKLE_SPEED, color.TEAL)
+comet = Comet(
+    strip_pixels,
+    COMET_SPEED,
+    color.TEAL,
+    tail_length=STRIP_COMET_TAIL_LENGTH,
+    bounce=STRIP_COMET_BOUNCE,
+)
+
 animations = AnimationSequence(
-    AnimationGroup(
-        SparklePulse(strip_pixels, SPARKLE_SPEED, color.TEAL)
-    ),
-    AnimationGroup(
-        Comet(
-            strip_pixels,
-            COMET_SPEED,
-            color.TEAL,
-            tail_length=STRIP_COMET_TAIL_LENGTH,
-            bounce=STRIP_COMET_BOUNCE,
-        )
-    ),
+    AnimationGroup(sparkle_pulse),
+    AnimationGroup(comet),
 )
 
+# draws until the comet is back at its start (Comet.reset / Comet.draw)
+COMET_CYCLE = (STRIP_PIXEL_NUMBER + STRIP_COMET_TAIL_LENGTH + 1) * (2 if STRIP_COMET_BOUNCE else 1)
+
+# per animation: (animation object, frame period in s, frames per cycle),
+# same order as above; SparklePulse has no frame position (random
+# sparkles, pulse from the clock), so its cycle is 1
+ANIMATION_FRAMES = [
+    (sparkle_pulse, SPARKLE_SPEED, 1),
+    (comet, COMET_SPEED, COMET_CYCLE),
+]
+animation_idx = 0
+
 animation_color = None
 blanked = False
 
@@ -126,26 +176,182 @@ color_idx = 0
 ble = BLERadio()
 uart = UARTService()
 advertisement = ProvideServicesAdvertisement(uart)
+sync_advertisement = CubeSyncAdvertisement()
+
+# one reader for binary commands and Bluefruit packets, no per packet buffers
+uart_reader = proto.CommandReader(
+    512,
+    {
+        ord("C"): ColorPacket.PACKET_LENGTH,
+        ord("B"): ButtonPacket.PACKET_LENGTH,
+    },
+)
+reply_buf = bytearray(proto.HEADER_SIZE + 1 + max(proto.STATUS_SIZE, proto.STREAM_STATS_SIZE))
+
+# USB serial data port (enabled in boot.py), used for frame streaming
+usb_reader = proto.CommandReader(512)
+
+# frames handled per loop pass; older ones are dropped by the stream
+MAX_COMMANDS_PER_POLL = 4
+
+
+# -----------------------------------------------------------------------------
+# Live frame stream
+# -----------------------------------------------------------------------------
+
+def write_strip(buf):
+    # zero-copy: the stream buffer goes to the strip as is (strip byte order)
+    neopixel_write(strip_pixels.pin, buf)
+
+
+stream = FrameStream(STRIP_PIXEL_NUMBER, strip_pixels.bpp, write=write_strip)
+stream_port = None
+
+
+def update_stream():
+    global blanked
+    now = time.monotonic()
+    if stream.expired(now):
+        log(elog.EV_STREAM_END, stream.shown, stream.lost)
+        stream.stop()
+        blanked = False
+        return
+    stream.show(now)
+    if stream.update_fps(now):
+        log(elog.EV_STREAM_STATS, int(stream.fps * 10), stream.dropped)
+        if stream_port is not None:
+            n = proto.encode_stream_stats_into(
+                reply_buf, stream.last_seq, stream.fps, stream.dropped, stream.lost
+            )
+            stream_port.write(reply_buf[:n])
+
+
+# -----------------------------------------------------------------------------
+# Sync (leader beacon / follower phase lock)
+# -----------------------------------------------------------------------------
+
+sync_clock = SyncClock(latency_ms=int(ModeController.SYNC_REFRESH_S * 1000) // 4)
+frame_lock = FrameLock(int(ANIMATION_FRAMES[0][1] * 1000))
+sync_seq = 0
+
+
+def local_ms():
+    return time.monotonic_ns() // 1000000
+
+
+def set_animation(idx):
+    global animation_idx
+    animation_idx = idx % len(ANIMATION_FRAMES)
+    animations.activate(animation_idx)
+
+
+def synced_pulse(anim):
+    # SparklePulse takes its brightness from a pulse generator running on
+    # the cube's own clock, not from frames; in SYNC the pulse phase comes
+    # from the shared sync clock instead (sparkle positions stay random)
+    period = int(anim.period * 1000)
+    half = period // 2
+    while True:
+        pos = sync_clock.now(local_ms()) % period
+        if pos > half:
+            pos = period - pos
+        level = anim.min_intensity + (anim.max_intensity - anim.min_intensity) * pos / half
+        yield color.calculate_intensity(anim.color, level)
+
+
+def sync_begin():
+    # the frame lock owns the timing in SYNC: animations draw on every call
+    for anim, _, _ in ANIMATION_FRAMES:
+        anim.speed = 0
+    sync_clock.unlock()
+    sync_restart(sync_clock.now(local_ms()))
+
+
+def sync_end():
+    for anim, speed, _ in ANIMATION_FRAMES:
+        anim.speed = speed
+    sparkle_pulse.reset()  # back to its own pulse generator
+
+
+def sync_restart(start_ms):
+    frame_lock.restart(start_ms, int(ANIMATION_FRAMES[animation_idx][1] * 1000))
+    animations.reset()
+    # reset() recreates the free running generator, replace it again
+    sparkle_pulse._generator = synced_pulse(sparkle_pulse)
+
+
+def on_sync_tx(adv):
+    global sync_seq
+    sync_seq = (sync_seq + 1) & 0xFF
+    c = animation_color or COLORS[color_idx]
+    adv.beacon = (
+        sync_clock.now(local_ms()),
+        frame_lock.start_ms,
+        sync_seq,
+        animation_idx,
+        c[0], c[1], c[2],
+    )
+
+
+def on_sync_rx(adv):
+    global animation_color
+    b = adv.beacon
+    if b is None:
+        return
+    if sync_clock.observe(b.leader_ms, local_ms()):
+        log(elog.EV_SYNC_SNAP, 0, sync_clock.last_error)
+
+    if b.animation != animation_idx:
+        set_animation(b.animation)
+        sync_restart(b.anim_start_ms)
+    elif b.anim_start_ms != frame_lock.start_ms:
+        sync_restart(b.anim_start_ms)
+
+    c = (b.red, b.green, b.blue)
+    if c != animation_color:
+        animations.color = c
+        animation_color = c
+
+
+def animate_synced():
+    n = frame_lock.frames_due(sync_clock.now(local_ms()))
+    skipped = frame_lock.take_skipped()
+    if skipped:
+        # the position of a frame-stepped animation is its number of draws:
+        # step over the skipped frames without showing them
+        anim, _, cycle = ANIMATION_FRAMES[animation_idx]
+        for _ in range(skipped % cycle):
+            anim.draw()
+    for _ in range(n):
+        animations.animate()
+    return n > 0
 
 
 # -----------------------------------------------------------------------------
 # Storage + Modes
 # -----------------------------------------------------------------------------
 
-storage = SimpleKVStorage("/settings.toml")
+storage = SimpleKVStorage("/settings.toml", log=log)
 
 
 def on_mode_change(mode):
-    print("Mode:", mode)
+    log(elog.EV_MODE, mode)
+    if mode == ModeController.SYNC:
+        log(elog.EV_SYNC_ROLE, 1 if modes.sync_leader else 0)
+        sync_begin()
+    else:
+        sync_end()
 
 
 def on_pairing_tick(seconds_left):
-    print("Pairing:", int(seconds_left), "s")
+    log(elog.EV_PAIRING_TICK, int(seconds_left))
     # TODO: LED countdown anzeigen
 
 
 def on_shelly_found(addr, adv):
-    print("Shelly paired:", addr)
+    # called for the pairing and for every button event; ModeController
+    # logs both itself (EV_SHELLY_PAIRED with the address, EV_SHELLY_EVENT)
+    pass
 
 
 modes = ModeController(
@@ -156,21 +362,16 @@ modes = ModeController(
     on_mode=on_mode_change,
     on_tick=on_pairing_tick,
     on_shelly=on_shelly_found,
+    sync_adv=sync_advertisement,
+    on_sync_tx=on_sync_tx,
+    on_sync_rx=on_sync_rx,
+    log=log,
 )
 
-def pretty_shelly_id(addr):
-    # addr z.B. "aa:bb:cc:dd:ee:ff" -> "DD:EE:FF" als kurze ID
-    if not addr:
-        return None
-    parts = addr.split(":")
-    if len(parts) >= 3:
-        return ":".join(p.upper() for p in parts[-3:])
-    return addr.upper()
-
 print("Startup mode:", modes.mode_name())
 
 if getattr(modes, "shelly_addr", None):
-    print("Shelly:", modes.shelly_addr.upper(), "| ID:", pretty_shelly_id(modes.shelly_addr))
+    print("Shelly:", modes.shelly_addr.upper(), "| ID:", pretty_id(modes.shelly_addr))
 else:
     print("Shelly: (none)")
 
@@ -200,18 +401,83 @@ def handle_remote_packet(packet):
         if remote_color_mode == 0:
             animations.color = packet.color
             animation_color = packet.color
-            print("Color:", packet.color)
+            log(elog.EV_COLOR, 1, elog.pack_color(packet.color))
         else:
             animations.color = animation_color
 
     elif isinstance(packet, ButtonPacket) and packet.pressed:
         if packet.button == ButtonPacket.LEFT:
-            animations.next()
-            print("Animation changed")
+            set_animation(animation_idx + 1)
+            log(elog.EV_ANIMATION, animation_idx)
 
         elif packet.button == ButtonPacket.RIGHT:
             remote_color_mode = (remote_color_mode + 1) % 2
-            print("Color mode:", remote_color_mode)
+            log(elog.EV_COLOR_MODE, remote_color_mode)
+
+        elif packet.button == ButtonPacket.UP:
+            modes.enter_sync(leader=True)
+
+        elif packet.button == ButtonPacket.DOWN:
+            modes.enter_sync(leader=False)
+
+
+def show_frame(payload):
+    # first pixel (uint16), then r, g, b per pixel
+    first = payload[0] | (payload[1] << 8)
+    end = first + (len(payload) - 2) // 3
+    if end > STRIP_PIXEL_NUMBER:
+        end = STRIP_PIXEL_NUMBER
+    j = 2
+    for i in range(first, end):
+        strip_pixels[i] = (payload[j] << 16) | (payload[j + 1] << 8) | payload[j + 2]
+        j += 3
+    strip_pixels.show()
+
+
+def handle_command(cmd, payload, port):
+    global animation_color, blanked, stream_port
+
+    if cmd == proto.SET_COLOR and len(payload) >= 3:
+        c = (payload[0], payload[1], payload[2])
+        animations.color = c
+        animation_color = c
+        blanked = False
+        log(elog.EV_COLOR, 2, elog.pack_color(c))
+
+    elif cmd == proto.SET_ANIMATION and len(payload) >= 1:
+        set_animation(payload[0])
+        blanked = False
+        log(elog.EV_ANIMATION, animation_idx)
+
+    elif cmd == proto.SET_BRIGHTNESS and len(payload) >= 1:
+        strip_pixels.brightness = payload[0] / 255
+
+    elif cmd == proto.FRAME and len(payload) >= 5:
+        # host drives the pixels until the next color / animation command
+        blanked = True
+        show_frame(payload)
+
+    elif cmd == proto.STATUS:
+        n = proto.encode_status_into(
+            reply_buf,
+            modes.mode,
+            animation_idx,
+            animation_color or COLORS[color_idx],
+            int(strip_pixels.brightness * 255),
+            STRIP_PIXEL_NUMBER,
+        )
+        port.write(reply_buf[:n])
+
+    elif cmd == proto.STREAM:
+        started = not stream.active
+        if stream.receive(payload, time.monotonic()):
+            if started:
+                log(elog.EV_STREAM_START, stream.last_seq)
+            blanked = True
+            stream_port = port
+
+    elif cmd == proto.LOG:
+        export_log(port, everything=True)
 
 
 # -----------------------------------------------------------------------------
@@ -225,25 +491,74 @@ while True:
         color_idx = (color_idx + 1) % len(COLORS)
         animations.color = COLORS[color_idx]
         animation_color = COLORS[color_idx]
-        print("Local button color:", COLORS[color_idx])
+        log(elog.EV_COLOR, 0, elog.pack_color(COLORS[color_idx]))
 
     elif ev == ButtonDetector.LONG_HELD:
+        log(elog.EV_BUTTON, ButtonDetector.LONG_HELD)
         modes.handle_long_press_3s()
 
-    if not blanked:
-        animations.animate()
+    drew = False
+    if blanked:
+        pass
+    elif modes.mode == ModeController.SYNC:
+        drew = animate_synced()
+    else:
+        drew = animations.animate()
 
     if modes.mode == ModeController.REMOTE and ble.connected:
-        if uart.in_waiting:
-            try:
-                packet = Packet.from_stream(uart)
-            except ValueError:
-                pass
+        for _ in range(MAX_COMMANDS_PER_POLL):
+            kind = uart_reader.poll(uart)
+            if kind == proto.CommandReader.COMMAND:
+                handle_command(uart_reader.cmd, uart_reader.payload, uart)
+            elif kind == proto.CommandReader.BLUEFRUIT:
+                try:
+                    packet = Packet.from_bytes(bytes(uart_reader.frame))
+                except ValueError:
+                    pass
+                else:
+                    handle_remote_packet(packet)
             else:
-                handle_remote_packet(packet)
+                break
+
+    if supervisor.runtime.usb_connected and usb_cdc.data is not None:
+        for _ in range(MAX_COMMANDS_PER_POLL):
+            if usb_reader.poll(usb_cdc.data) != proto.CommandReader.COMMAND:
+                break
+            handle_command(usb_reader.cmd, usb_reader.payload, usb_cdc.data)
+
+    if stream.active:
+        update_stream()
+
+    # idle time only: no frame drawn in this pass, nothing streaming, not
+    # pairing; the export takes the place of this pass's mode scan
+    exported = False
+    if (
+        not drew
+        and not stream.active
+        and modes.mode != ModeController.PAIRING
+        and supervisor.runtime.usb_connected
+        and usb_cdc.data is not None
+        and len(event_log)
+    ):
+        now = time.monotonic()
+        if now >= log_next_export:
+            log_next_export = now + LOG_EXPORT_S
+            export_log(usb_cdc.data)
+            exported = True
+
+    # mode scans block the loop (BUTTON 150 ms, SYNC listen 60 ms): no scans
+    # while a stream runs, Shelly events and SYNC beacons wait until it ends;
+    # pairing is started by hand and keeps running, a SYNC leader keeps
+    # refreshing its beacon (no scan) so the followers' clocks stay fresh
+    if exported:
+        pass
+    elif (
+        not stream.active
+        or modes.mode == ModeController.PAIRING
+        or (modes.mode == ModeController.SYNC and modes.sync_leader)
+    ):
+        modes.update()
 
-    modes.update()
-    
 
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
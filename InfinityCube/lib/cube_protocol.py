@@ -0,0 +1,177 @@
+# cube_protocol.py
+#
+# Compact binary command protocol on the UART service.
+# Length-prefixed frames, parsed in place from one preallocated buffer:
+#
+#   0xC5 | len (uint16 LE) | cmd | payload (len - 1 bytes)
+#
+# Bluefruit Connect packets ("!C..", "!B..") can share the same stream;
+# the reader hands them back untouched for Packet.from_bytes().
+# Pure Python so the host tools can encode / decode frames too.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import struct
+
+MAGIC = 0xC5
+HEADER_SIZE = 3
+BLUEFRUIT_START = 0x21  # "!"
+
+# commands (host -> cube)
+SET_COLOR = 0x01       # r, g, b
+SET_ANIMATION = 0x02   # index
+SET_BRIGHTNESS = 0x03  # 0..255
+FRAME = 0x04           # first pixel (uint16 LE), then r, g, b per pixel
+STATUS = 0x05          # no payload, answered with STATUS | REPLY
+STREAM = 0x06          # live frame (see frame_stream), STREAM | REPLY reports stats
+LOG = 0x07             # export the event log, answered with LOG | REPLY frames
+
+REPLY = 0x80
+
+# mode, animation, r, g, b, brightness, pixel count
+STATUS_FORMAT = "<BBBBBBH"
+STATUS_SIZE = struct.calcsize(STATUS_FORMAT)
+
+# last shown seq, fps * 10, dropped, lost
+STREAM_STATS_FORMAT = "<HHHH"
+STREAM_STATS_SIZE = struct.calcsize(STREAM_STATS_FORMAT)
+
+
+def encode(cmd, payload=b""):
+    """Host side: build one frame."""
+    n = len(payload) + 1
+    return bytes((MAGIC, n & 0xFF, n >> 8, cmd)) + bytes(payload)
+
+
+def encode_status_into(buf, mode, animation, color, brightness, pixels):
+    """Cube side: write a STATUS reply frame into buf, returns its size."""
+    n = STATUS_SIZE + 1
+    buf[0] = MAGIC
+    buf[1] = n & 0xFF
+    buf[2] = n >> 8
+    buf[3] = STATUS | REPLY
+    r, g, b = color
+    struct.pack_into(STATUS_FORMAT, buf, 4, mode, animation, r, g, b, brightness, pixels)
+    return HEADER_SIZE + n
+
+
+def encode_stream_stats_into(buf, seq, fps, dropped, lost):
+    n = STREAM_STATS_SIZE + 1
+    buf[0] = MAGIC
+    buf[1] = n & 0xFF
+    buf[2] = n >> 8
+    buf[3] = STREAM | REPLY
+    struct.pack_into(
+        STREAM_STATS_FORMAT, buf, 4,
+        seq & 0xFFFF, min(0xFFFF, int(fps * 10)), dropped & 0xFFFF, lost & 0xFFFF
+    )
+    return HEADER_SIZE + n
+
+
+def decode_status(payload):
+    return struct.unpack_from(STATUS_FORMAT, payload)
+
+
+def decode_stream_stats(payload):
+    seq, fps10, dropped, lost = struct.unpack_from(STREAM_STATS_FORMAT, payload)
+    return seq, fps10 / 10, dropped, lost
+
+
+class CommandReader:
+    """Collects frames from a stream (UARTService, usb_cdc) without
+    allocating per packet.
+
+    poll() reads what is waiting and returns NONE, COMMAND or BLUEFRUIT.
+    For COMMAND, cmd and payload (a memoryview into the buffer) are set;
+    for BLUEFRUIT, frame holds the raw packet. Both are only valid until
+    the next poll().
+    """
+
+    NONE = 0
+    COMMAND = 1
+    BLUEFRUIT = 2
+
+    def __init__(self, size=512, bluefruit_lengths=None):
+        self._size = size
+        self._buf = bytearray(size)
+        self._mv = memoryview(self._buf)
+        self._n = 0
+        self._consumed = 0
+        # packet type byte -> total packet length, e.g. {ord("C"): 6}
+        self._bluefruit = bluefruit_lengths or {}
+
+        self.cmd = 0
+        self.payload = self._mv[0:0]
+        self.frame = self._mv[0:0]
+        self.dropped = 0
+
+    def poll(self, stream):
+        if self._consumed:
+            self._drop(self._consumed)
+            self._consumed = 0
+
+        waiting = stream.in_waiting
+        if waiting:
+            space = self._size - self._n
+            if waiting > space:
+                waiting = space
+            if waiting:
+                got = stream.readinto(self._mv[self._n:self._n + waiting])
+                if got:
+                    self._n += got
+
+        return self._parse()
+
+    def _drop(self, k):
+        rest = self._n - k
+        if rest > 0:
+            self._buf[0:rest] = self._mv[k:self._n]
+        else:
+            rest = 0
+        self._n = rest
+
+    def _resync(self):
+        # skip to the next possible frame start
+        buf = self._buf
+        i = 1
+        while i < self._n and buf[i] != MAGIC and buf[i] != BLUEFRUIT_START:
+            i += 1
+        self.dropped += i
+        self._drop(i)
+
+    def _parse(self):
+        buf = self._buf
+        while self._n:
+            b0 = buf[0]
+
+            if b0 == MAGIC:
+                if self._n < HEADER_SIZE:
+                    return self.NONE
+                total = HEADER_SIZE + (buf[1] | (buf[2] << 8))
+                if total == HEADER_SIZE or total > self._size:
+                    self._resync()
+                    continue
+                if self._n < total:
+                    return self.NONE
+                self.cmd = buf[HEADER_SIZE]
+                self.payload = self._mv[HEADER_SIZE + 1:total]
+                self._consumed = total
+                return self.COMMAND
+
+            if b0 == BLUEFRUIT_START and self._bluefruit:
+                if self._n < 2:
+                    return self.NONE
+                total = self._bluefruit.get(buf[1])
+                if total is None:
+                    self._resync()
+                    continue
+                if self._n < total:
+                    return self.NONE
+                self.frame = self._mv[0:total]
+                self._consumed = total
+                return self.BLUEFRUIT
+
+            self._resync()
+
+        return self.NONE
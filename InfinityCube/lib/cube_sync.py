@@ -0,0 +1,160 @@
+# cube_sync.py
+#
+# Shared timebase for several cubes running the same animation.
+# A leader broadcasts its clock, the active animation and color in a
+# compact beacon; followers phase-lock their frame clocks to it.
+# Pure Python (no hardware imports) so the host simulation can reuse it.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import struct
+
+# manufacturer data: Adafruit company id, entry key of the sync beacon
+ADAFRUIT_COMPANY_ID = 0x0822
+SYNC_DATA_ID = 0x1CBE
+
+# leader_ms, anim_start_ms, seq, animation, red, green, blue  (13 bytes)
+BEACON_FORMAT = "<IIBBBBB"
+BEACON_FIELDS = ("leader_ms", "anim_start_ms", "seq", "animation", "red", "green", "blue")
+BEACON_SIZE = struct.calcsize(BEACON_FORMAT)
+
+_MASK = 0xFFFFFFFF
+_HALF = 0x80000000
+
+
+def wrap_diff(a, b):
+    """Signed distance a - b on the 32 bit millisecond ring."""
+    return ((a - b + _HALF) & _MASK) - _HALF
+
+
+def pack_beacon(leader_ms, anim_start_ms, seq, animation, color):
+    r, g, b = color
+    return struct.pack(
+        BEACON_FORMAT,
+        leader_ms & _MASK, anim_start_ms & _MASK, seq & 0xFF, animation & 0xFF, r, g, b
+    )
+
+
+def unpack_beacon(data):
+    return struct.unpack_from(BEACON_FORMAT, data)
+
+
+def beacon_from_manufacturer_data(data):
+    """Find the beacon in Adafruit manufacturer data (after company id).
+
+    The data is a list of [length][key (2)][value] entries as written by
+    adafruit_ble ManufacturerData. Returns the unpacked tuple or None.
+    """
+    i = 0
+    n = len(data)
+    while i + 3 <= n:
+        size = data[i]
+        key = data[i + 1] | (data[i + 2] << 8)
+        if key == SYNC_DATA_ID and size - 2 == BEACON_SIZE and i + 1 + size <= n:
+            return unpack_beacon(data[i + 3:i + 3 + BEACON_SIZE])
+        i += 1 + size
+    return None
+
+
+class SyncClock:
+    """Maps the local millisecond clock onto the leader's timebase.
+
+    Advertising latency only ever makes a beacon look older, so the
+    sample closest to the truth is the one with the largest error.
+    Samples are collected in small windows; the best one of each window
+    nudges the offset (gain) or snaps it when the error is large.
+    latency_ms is the expected age of that best sample (about
+    refresh interval / (window + 1)) and is added back to it.
+    """
+
+    def __init__(self, *, gain=0.25, snap_ms=300, window=3, latency_ms=0):
+        self.gain = float(gain)
+        self.latency_ms = int(latency_ms)
+        self.snap_ms = int(snap_ms)
+        self.window = int(window)
+        self.offset = 0
+        self.locked = False
+        self.last_error = 0
+        self._best = None
+        self._samples = 0
+
+    def now(self, local_ms):
+        return (local_ms + self.offset) & _MASK
+
+    def unlock(self):
+        self.locked = False
+        self._best = None
+        self._samples = 0
+
+    def observe(self, leader_ms, local_ms):
+        """Feed one received beacon. Returns True if the clock jumped."""
+        err = wrap_diff(leader_ms + self.latency_ms, self.now(local_ms))
+        if self._best is None or err > self._best:
+            self._best = err
+        self._samples += 1
+
+        # first sample after (re)lock is taken right away
+        if self.locked and self._samples < self.window:
+            return False
+
+        err = self._best
+        self._best = None
+        self._samples = 0
+        self.last_error = err
+
+        if not self.locked or abs(err) > self.snap_ms:
+            self.offset += err
+            self.locked = True
+            return True
+
+        self.offset += int(err * self.gain)
+        return False
+
+
+class FrameLock:
+    """Counts animation frames against a shared start time.
+
+    frames_due() tells the caller how many frames to draw right now so
+    that its frame counter matches the one every other cube computes
+    from the same timebase. Large gaps are not replayed: at most
+    max_catchup frames are drawn, the rest is collected in skipped.
+    Frame-stepped animations must be advanced by take_skipped() frames
+    without showing them, or they stay behind the other cubes for good.
+    """
+
+    def __init__(self, period_ms, *, max_catchup=3):
+        self.period_ms = max(1, int(period_ms))
+        self.max_catchup = int(max_catchup)
+        self.start_ms = 0
+        self.drawn = 0      # frame number reached, drawn or skipped
+        self.skipped = 0    # skipped frames not yet taken
+
+    def restart(self, start_ms, period_ms=None):
+        if period_ms is not None:
+            self.period_ms = max(1, int(period_ms))
+        self.start_ms = start_ms & _MASK
+        self.drawn = 0
+        self.skipped = 0
+
+    def expected(self, sync_ms):
+        elapsed = wrap_diff(sync_ms, self.start_ms)
+        if elapsed < 0:
+            return 0
+        return elapsed // self.period_ms + 1
+
+    def frames_due(self, sync_ms):
+        behind = self.expected(sync_ms) - self.drawn
+        if behind <= 0:
+            return 0
+        self.drawn += behind
+        if behind > self.max_catchup:
+            self.skipped += behind - self.max_catchup
+            behind = self.max_catchup
+        return behind
+
+    def take_skipped(self):
+        """Frames skipped since the last call, to be fast-forwarded."""
+        n = self.skipped
+        self.skipped = 0
+        return n
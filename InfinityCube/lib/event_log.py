@@ -0,0 +1,137 @@
+# event_log.py
+#
+# Structured event log: fixed-size binary records in a preallocated
+# ring buffer. Logging is a single struct.pack_into (no strings, no
+# serial I/O); records are exported later in idle time or on request
+# as LOG reply frames (see cube_protocol). Decode them on the host with
+# tools/event_log_decode.py.
+#
+# Record: ticks (u32, supervisor.ticks_ms), code (u16), a (u16), b (i32)
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import struct
+
+import cube_protocol as proto
+
+RECORD_FORMAT = "<IHHi"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+TICKS_PERIOD = 1 << 29  # supervisor.ticks_ms() wraps here
+
+# LOG reply payload: dropped records (u16), then records
+EXPORT_HEADER_FORMAT = "<H"
+EXPORT_HEADER_SIZE = struct.calcsize(EXPORT_HEADER_FORMAT)
+
+# ---- event codes (a, b) ----
+EV_BOOT = 1             # -, -
+EV_MODE = 2             # mode, -
+EV_BUTTON = 3           # ButtonDetector event, -
+EV_COLOR = 4            # source (0 button, 1 remote, 2 command, 3 sync), 0xRRGGBB
+EV_ANIMATION = 5        # index, -
+EV_COLOR_MODE = 6       # remote color mode, -
+EV_PAIRING_TICK = 7     # seconds left, -
+EV_SHELLY_PAIRED = 8    # address bytes 0-1, address bytes 2-5 (see pack_addr)
+EV_SHELLY_EVENT = 9     # BTHome packet id (0xFFFF unknown), button event
+EV_STORAGE_SKIP = 10    # -, -  (USB active, settings.toml not written)
+EV_STORAGE_WRITE = 11   # number of keys, -
+EV_STREAM_START = 12    # seq, -
+EV_STREAM_END = 13      # frames shown, frames lost
+EV_STREAM_STATS = 14    # fps * 10, frames dropped
+EV_SYNC_ROLE = 15       # 1 leader / 0 follower, -
+EV_SYNC_SNAP = 16       # -, clock error in ms
+
+
+def pack_color(c):
+    return (c[0] << 16) | (c[1] << 8) | c[2]
+
+
+def pack_addr(address_bytes):
+    """6 address bytes (little-endian, as _bleio) -> (a, b) record args."""
+    x = address_bytes
+    b = x[2] | (x[3] << 8) | (x[4] << 16) | (x[5] << 24)
+    if b & 0x80000000:
+        b -= 0x100000000
+    return x[0] | (x[1] << 8), b
+
+
+def unpack_addr(a, b):
+    b &= 0xFFFFFFFF
+    return bytes((a & 0xFF, a >> 8, b & 0xFF, (b >> 8) & 0xFF, (b >> 16) & 0xFF, b >> 24))
+
+
+class EventLog:
+    """Ring buffer of fixed-size records; the oldest are overwritten."""
+
+    def __init__(self, capacity=128, clock=None):
+        self.capacity = capacity
+        self.clock = clock
+        self._buf = bytearray(capacity * RECORD_SIZE)
+        self._mv = memoryview(self._buf)
+        self._head = 0      # next write slot
+        self._count = 0
+        self.dropped = 0    # overwritten before export
+
+    def __len__(self):
+        return self._count
+
+    def log(self, code, a=0, b=0):
+        t = self.clock() if self.clock else 0
+        struct.pack_into(RECORD_FORMAT, self._buf, self._head * RECORD_SIZE, t, code, a & 0xFFFF, b)
+        self._head += 1
+        if self._head == self.capacity:
+            self._head = 0
+        if self._count == self.capacity:
+            self.dropped += 1
+        else:
+            self._count += 1
+
+    def export_into(self, buf, max_records):
+        """Move up to max_records oldest records into a LOG reply frame.
+
+        buf needs room for frame_size(max_records) bytes. Returns the
+        frame size, 0 if the log is empty.
+        """
+        n = self._count
+        if n > max_records:
+            n = max_records
+        if not n:
+            return 0
+
+        size = 1 + EXPORT_HEADER_SIZE + n * RECORD_SIZE
+        buf[0] = proto.MAGIC
+        buf[1] = size & 0xFF
+        buf[2] = size >> 8
+        buf[3] = proto.LOG | proto.REPLY
+        struct.pack_into(EXPORT_HEADER_FORMAT, buf, 4, min(self.dropped, 0xFFFF))
+        self.dropped = 0
+
+        # copy oldest first, at most two slices around the wrap
+        tail = (self._head - self._count) % self.capacity
+        o = 4 + EXPORT_HEADER_SIZE
+        left = n
+        while left:
+            k = self.capacity - tail
+            if k > left:
+                k = left
+            a = tail * RECORD_SIZE
+            b = k * RECORD_SIZE
+            buf[o:o + b] = self._mv[a:a + b]
+            o += b
+            left -= k
+            tail = (tail + k) % self.capacity
+        self._count -= n
+        return proto.HEADER_SIZE + size
+
+
+def frame_size(max_records):
+    return proto.HEADER_SIZE + 1 + EXPORT_HEADER_SIZE + max_records * RECORD_SIZE
+
+
+def decode_records(payload):
+    """Host side: LOG reply payload -> (dropped, [(ticks, code, a, b), ...])."""
+    dropped = struct.unpack_from(EXPORT_HEADER_FORMAT, payload)[0]
+    records = []
+    for o in range(EXPORT_HEADER_SIZE, len(payload) - RECORD_SIZE + 1, RECORD_SIZE):
+        records.append(struct.unpack_from(RECORD_FORMAT, payload, o))
+    return dropped, records
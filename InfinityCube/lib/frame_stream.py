@@ -0,0 +1,180 @@
+# frame_stream.py
+#
+# Live frame streaming into the strip (video / music visualisation).
+# Frames arrive as STREAM commands (see cube_protocol) over the BLE
+# UART or USB serial and are decoded into one of two preallocated
+# buffers. The strip is written straight from the front buffer with
+# neopixel_write, bypassing the pixel object (bytes are in strip order,
+# brightness is applied by the sender).
+#
+# Payload: seq (uint16 LE) | encoding | data
+#   RAW    n * bpp bytes
+#   RLE    [count][pixel] ...                      runs of equal pixels
+#   DELTA  [skip][count][count pixels] ...         changes to the last frame
+#
+# Pure Python (no hardware imports); the writer is passed in.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+RAW = 0
+RLE = 1
+DELTA = 2
+
+HEADER_SIZE = 3
+
+
+class FrameStream:
+    """Double-buffered frame sink with drop-oldest backpressure.
+
+    receive() decodes into the pending buffer; if the previous frame was
+    not shown yet it is overwritten (counted as dropped), so the strip
+    always shows the newest frame. show() swaps and writes it out.
+    A gap in the sequence numbers invalidates the delta base; deltas
+    are then ignored until the next RAW or RLE key frame.
+    """
+
+    def __init__(self, pixels, bpp=3, *, write=None, timeout_s=2.0):
+        self.size = pixels * bpp
+        self.bpp = bpp
+        self.write = write
+        self.timeout_s = timeout_s
+        self._front = bytearray(self.size)
+        self._back = bytearray(self.size)
+        self._pending = False
+        self._have_base = False
+        self._seq = None
+
+        self.last_seq = 0
+        self.last_rx = None
+        self.shown = 0
+        self.dropped = 0
+        self.lost = 0
+        self.skipped = 0    # deltas without a base
+        self.fps = 0.0
+        self._fps_shown = 0
+        self._fps_t = None
+
+    # ---- receive ----
+
+    def receive(self, payload, now):
+        if len(payload) < HEADER_SIZE:
+            return False
+        seq = payload[0] | (payload[1] << 8)
+        enc = payload[2]
+
+        if self._seq is not None:
+            gap = (seq - self._seq - 1) & 0xFFFF
+            if gap >= 0x8000:
+                return False  # old / duplicate frame
+            if gap:
+                self.lost += gap
+                self._have_base = False
+
+        if enc == DELTA and not self._have_base:
+            # no base to apply it to: skip, but keep the sequence so the
+            # gap is counted only once
+            self.skipped += 1
+            self._seq = seq
+            return False
+
+        back = self._back
+        if not self._pending:
+            # the delta base is the frame on the strip
+            back[:] = self._front
+
+        data = payload[HEADER_SIZE:]
+        if enc == RAW:
+            n = len(data)
+            if n > self.size:
+                n = self.size
+            back[0:n] = data[0:n]
+        elif enc == RLE:
+            self._decode_rle(back, data)
+        elif enc == DELTA:
+            self._decode_delta(back, data)
+        else:
+            return False
+
+        if self._pending:
+            self.dropped += 1
+        self._pending = True
+        self._have_base = True
+        self._seq = seq
+        self.last_seq = seq
+        self.last_rx = now
+        return True
+
+    def _decode_rle(self, back, data):
+        bpp = self.bpp
+        size = self.size
+        j = 0
+        i = 0
+        n = len(data)
+        while i + 1 + bpp <= n and j < size:
+            count = data[i]
+            i += 1
+            while count and j < size:
+                for k in range(bpp):
+                    back[j + k] = data[i + k]
+                j += bpp
+                count -= 1
+            i += bpp
+
+    def _decode_delta(self, back, data):
+        bpp = self.bpp
+        size = self.size
+        j = 0
+        i = 0
+        n = len(data)
+        while i + 2 <= n:
+            j += data[i] * bpp
+            count = data[i + 1] * bpp
+            i += 2
+            if i + count > n or j + count > size:
+                return
+            back[j:j + count] = data[i:i + count]
+            i += count
+            j += count
+
+    # ---- output ----
+
+    @property
+    def active(self):
+        return self.last_rx is not None
+
+    def expired(self, now):
+        return self.last_rx is not None and (now - self.last_rx) > self.timeout_s
+
+    def stop(self):
+        self.last_rx = None
+        self._seq = None
+        self._pending = False
+        self._have_base = False
+        self.fps = 0.0
+        self._fps_t = None
+
+    def show(self, now):
+        if not self._pending:
+            return False
+        self._front, self._back = self._back, self._front
+        self._pending = False
+        if self.write:
+            self.write(self._front)
+        self.shown += 1
+        self._fps_shown += 1
+        return True
+
+    def update_fps(self, now, every_s=1.0):
+        """Returns True when a new fps value is available."""
+        if self._fps_t is None:
+            self._fps_t = now
+            self._fps_shown = 0
+            return False
+        dt = now - self._fps_t
+        if dt < every_s:
+            return False
+        self.fps = self._fps_shown / dt
+        self._fps_t = now
+        self._fps_shown = 0
+        return True
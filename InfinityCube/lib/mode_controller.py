@@ -1,32 +1,52 @@
 # mode_controller.py
 #
 # Central state machine for device control modes:
-# OFFLINE, PAIRING, BUTTON, REMOTE.
-# Manages BLE advertising, scanning, and mode transitions.
+# OFFLINE, PAIRING, BUTTON, REMOTE, SYNC.
+# Transitions and radio profiles come from mode_table; every mode has
+# optional enter / exit / update handlers. A mode switch only touches
+# the BLE resources that differ between the two modes.
 #
 # (c) 2025 Stephan Zehrer
 # SPDX-License-Identifier: GPL-3.0-only
 
 
 import time
+import random
 from adafruit_ble.advertising import Advertisement
 
+from shelly_ble import addr_to_str, format_addr, bthome_payload, parse_bthome, PacketFilter, AD_SERVICE_DATA_16
+from pairing import PairingEngine
+from event_log import EV_SHELLY_EVENT, EV_SHELLY_PAIRED, pack_addr
+import mode_table as mt
+
 class ModeController:
-    OFFLINE = 0
-    PAIRING = 1
-    BUTTON  = 2
-    REMOTE  = 3
+    OFFLINE = mt.OFFLINE
+    PAIRING = mt.PAIRING
+    BUTTON  = mt.BUTTON
+    REMOTE  = mt.REMOTE
+    SYNC    = mt.SYNC
     
     MODE_NAMES = {
         OFFLINE: "OFFLINE",
         PAIRING: "PAIRING",
         BUTTON:  "BUTTON",
         REMOTE:  "REMOTE",
+        SYNC:    "SYNC",
     }
+
+    # SYNC radio timing: the leader refreshes its beacon, followers listen
+    # with a short scan window so the frame loop is barely interrupted.
+    SYNC_ADV_INTERVAL_S = 0.05
+    SYNC_REFRESH_S = 0.25
+    SYNC_LISTEN_S = 1.0
+    SYNC_SCAN_INTERVAL_S = 0.32
+    SYNC_SCAN_WINDOW_S = 0.03
+    SYNC_SCAN_TIMEOUT_S = 0.06
     
     def __init__(self, *, ble, storage, remote_adv=None,
-                 pairing_s=10.0, scan_step_s=0.25,
-                 on_mode=None, on_tick=None, on_shelly=None):
+                 pairing_s=10.0, scan_step_s=0.25, pairing=None,
+                 on_mode=None, on_tick=None, on_shelly=None,
+                 sync_adv=None, on_sync_tx=None, on_sync_rx=None, log=None):
         self.ble = ble
         self.storage = storage
         self.remote_adv = remote_adv
@@ -35,6 +55,15 @@ class ModeController:
         self.on_mode = on_mode
         self.on_tick = on_tick
         self.on_shelly = on_shelly
+        self.log = log  # log(code, a, b), see event_log
+
+        # SYNC: on_sync_tx(adv) fills the beacon before it is (re)broadcast,
+        # on_sync_rx(adv) receives a beacon heard by a follower.
+        self.sync_adv = sync_adv
+        self.on_sync_tx = on_sync_tx
+        self.on_sync_rx = on_sync_rx
+        self.sync_leader = False
+        self._sync_next = 0.0
 
         data = self.storage.load() or {}
         self.shelly_addr = data.get("shelly_addr")
@@ -43,8 +72,27 @@ class ModeController:
         self.mode = self.BUTTON if self.shelly_addr else self.OFFLINE
         self._pairing_end = 0.0
         self._last_tick = None
+        self._packets = PacketFilter()
+        self._pairing = pairing or PairingEngine()
+
+        # per mode handlers, a missing entry means nothing to do
+        self._enter = {
+            self.PAIRING: self._enter_pairing,
+            self.SYNC: self._enter_sync,
+        }
+        self._exit = {
+            self.PAIRING: self._exit_pairing,
+        }
+        self._update = {
+            self.PAIRING: self._update_pairing,
+            self.BUTTON: self._update_button,
+            self.SYNC: self._update_sync,
+        }
 
-        self._apply_mode()
+        # radio state left by a previous run is unknown: full reset once
+        self._radio = mt.RADIO_UNKNOWN
+        self._reconfigure(mt.radio_profile(self.mode, self.sync_leader))
+        self._run_enter(self.mode)
 
     # ---- public ----
     
@@ -57,53 +105,115 @@ class ModeController:
         return self.mode_name()
 
     def handle_long_press_3s(self):
-        # Your transition rules:
-        if self.mode == self.OFFLINE:
-            self._enter_pairing()
-        elif self.mode in (self.BUTTON, self.REMOTE):
-            self._set_mode(self.OFFLINE)
+        self.dispatch(mt.LONG_PRESS)
+
+    def enter_sync(self, leader):
+        if self.sync_adv is None:
+            return
+        if mt.next_mode(self.mode, mt.SYNC_START) is None:
+            return
+        # a role change inside SYNC re-enters SYNC with the new radio profile
+        self.sync_leader = bool(leader)
+        self.dispatch(mt.SYNC_START)
+
+    def dispatch(self, event):
+        """Apply event via the transition table; False if it is ignored."""
+        m = mt.next_mode(self.mode, event)
+        if m is None:
+            return False
+        self._set_mode(m)
+        return True
 
     def update(self):
-        # ---- PAIRING MODE ----
-        if self.mode == self.PAIRING:
-            now = time.monotonic()
-            left = max(0.0, self._pairing_end - now)
-
-            li = int(left)
-            if self.on_tick and li != self._last_tick:
-                self._last_tick = li
-                self.on_tick(left)
-
-            if now >= self._pairing_end:
-                # timeout -> REMOTE (your rule)
-                self._set_mode(self.REMOTE)
-                return
-
-            found = self._scan_once()
-            if found:
-                addr, adv = found
-                self.shelly_addr = addr
-                self.storage.save({"shelly_addr": self.shelly_addr})
-                if self.on_shelly:
-                    self.on_shelly(addr, adv)
-                self._set_mode(self.BUTTON)
-
-            return  # PAIRING exklusiv
-
-        # ---- BUTTON MODE (TEST) ----
-        if self.mode == self.BUTTON and self.shelly_addr:
-            self._scan_shelly_button()
+        run = self._update.get(self.mode)
+        if run:
+            run()
 
     # ---- internals ----
+
+    def _update_pairing(self):
+        now = time.monotonic()
+        left = max(0.0, self._pairing_end - now)
+
+        li = int(left)
+        if self.on_tick and li != self._last_tick:
+            self._last_tick = li
+            self.on_tick(left)
+
+        if now >= self._pairing_end:
+            # window over: best candidate -> BUTTON, none -> REMOTE
+            if not self._commit_pairing():
+                self.dispatch(mt.PAIRING_TIMEOUT)
+            return
+
+        self._scan_pairing()
+        if self._pairing.confident():
+            self._commit_pairing()
+
+    def _update_button(self):
+        # TEST: scan for Shelly button events
+        if self.shelly_addr:
+            self._scan_shelly_button()
+
+    def _update_sync(self):
+        now = time.monotonic()
+        if now < self._sync_next:
+            return
+        if self.sync_leader:
+            self._sync_next = now + self.SYNC_REFRESH_S
+            self._broadcast_sync()
+        else:
+            # jitter keeps the listen phase from locking onto the refresh
+            self._sync_next = now + self.SYNC_LISTEN_S * random.uniform(0.5, 1.5)
+            self._listen_sync()
+
+    def _broadcast_sync(self):
+        if self.on_sync_tx:
+            self.on_sync_tx(self.sync_adv)
+        try: self.ble.stop_advertising()
+        except Exception: pass
+        try:
+            self.ble.start_advertising(
+                self.sync_adv, interval=self.SYNC_ADV_INTERVAL_S
+            )
+        except Exception:
+            pass
+
+    def _listen_sync(self):
+        # low duty cycle: short window per interval, stop at first beacon
+        try:
+            for adv in self.ble.start_scan(
+                type(self.sync_adv),
+                interval=self.SYNC_SCAN_INTERVAL_S,
+                window=self.SYNC_SCAN_WINDOW_S,
+                timeout=self.SYNC_SCAN_TIMEOUT_S,
+            ):
+                if self.on_sync_rx:
+                    self.on_sync_rx(adv)
+                break
+        except Exception:
+            pass
+        try: self.ble.stop_scan()
+        except Exception: pass
     
     def _scan_shelly_button(self):
         # Test scan for shelly button events (no cooldown yet)
         for adv in self.ble.start_scan(Advertisement, timeout=0.15):
-            addr = self._addr_to_str(getattr(adv, "address", None))
+            addr = addr_to_str(getattr(adv, "address", None))
             if addr != self.shelly_addr:
                 continue
 
-            print("[shelly] event from", addr)
+            # Shelly repeats every event; report each BTHome packet id once
+            data = parse_bthome(bthome_payload(adv.data_dict.get(AD_SERVICE_DATA_16)))
+            if data and not self._packets.is_new(addr, data.get("packet_id")):
+                continue
+
+            if self.log:
+                packet_id = data.get("packet_id", 0xFFFF) if data else 0xFFFF
+                buttons = data.get("buttons") if data else None
+                self.log(EV_SHELLY_EVENT, packet_id, buttons[0] if buttons else 0)
+            else:
+                print("[shelly] event from", addr)
 
             if self.on_shelly:
                 # reuse callback for now (or later a dedicated on_shelly_press)
@@ -117,62 +227,91 @@ class ModeController:
             pass
 
     def _set_mode(self, m):
-        if m == self.mode:
+        radio = mt.radio_profile(m, self.sync_leader)
+        if m == self.mode and radio == self._radio:
             return
+        run = self._exit.get(self.mode)
+        if run:
+            run()
         self.mode = m
-        self._apply_mode()
+        self._reconfigure(radio)
+        self._run_enter(m)
         if self.on_mode:
             self.on_mode(self.mode)
 
-    def _apply_mode(self):
-        # stop everything first
-        try: self.ble.stop_scan()
-        except Exception: pass
-        try: self.ble.stop_advertising()
-        except Exception: pass
-        try:
-            if self.ble.connected:
-                self.ble.disconnect_all_connections()
-        except Exception:
-            pass
+    def _run_enter(self, m):
+        run = self._enter.get(m)
+        if run:
+            run()
 
-        if self.mode == self.OFFLINE:
-            return
+    def _reconfigure(self, radio):
+        # only stop / start what differs between the two profiles
+        stop, start = mt.radio_changes(self._radio, radio)
+        self._radio = radio
 
-        if self.mode == self.REMOTE and self.remote_adv is not None:
+        if stop == mt.RADIO_UNKNOWN:
+            try: self.ble.stop_scan()
+            except Exception: pass
+        if stop & mt.RADIO_ADVERTISING:
+            try: self.ble.stop_advertising()
+            except Exception: pass
+        if stop & mt.RADIO_CONNECTED:
+            try:
+                if self.ble.connected:
+                    self.ble.disconnect_all_connections()
+            except Exception:
+                pass
+
+        if start & mt.RADIO_ADV_REMOTE and self.remote_adv is not None:
             try: self.ble.start_advertising(self.remote_adv)
             except Exception: pass
-            return
+        # RADIO_ADV_SYNC: the first beacon goes out on the next update()
 
-        if self.mode == self.BUTTON:
-            # no scanning here (as per your earlier constraint).
-            # If you later want Shelly control here, we can add duty-cycled scanning.
-            return
+    def _enter_pairing(self):
+        self._pairing_end = time.monotonic() + self.pairing_s
+        self._last_tick = None
+        self._pairing.reset()
 
-        if self.mode == self.PAIRING:
-            self._pairing_end = time.monotonic() + self.pairing_s
-            self._last_tick = None
-            return
+    def _exit_pairing(self):
+        # drop the advertisements held by the candidate table
+        self._pairing.reset()
 
-    def _enter_pairing(self):
-        self._set_mode(self.PAIRING)
-
-    def _scan_once(self):
-        # NOTE: currently "first seen wins".
-        # We can tighten this to "only Shelly/BTHome" once we know your payload format.
-        for adv in self.ble.start_scan(Advertisement, timeout=self.scan_step_s):
-            addr = self._addr_to_str(getattr(adv, "address", None))
-            if addr:
-                self.ble.stop_scan()
-                return addr, adv
+    def _enter_sync(self):
+        # first beacon / first listen on the next update()
+        self._sync_next = 0.0
+
+    def _scan_pairing(self):
+        # collect candidates over the whole window, ranked by PairingEngine
+        engine = self._pairing
+        for adv in self.ble.start_scan(
+            Advertisement,
+            timeout=self.scan_step_s,
+            minimum_rssi=engine.min_rssi,
+        ):
+            engine.observe_adv(adv)
         try: self.ble.stop_scan()
         except Exception: pass
-        return None
 
-    @staticmethod
-    def _addr_to_str(addr_obj):
-        try:
-            b = addr_obj.address_bytes
-            return ":".join(f"{x:02x}" for x in b)
-        except Exception:
-            return None
\ No newline at end of file
+    def _commit_pairing(self):
+        engine = self._pairing
+        best = engine.best()
+        if best < 0:
+            return False
+        address_bytes = engine.address_bytes(best)
+        addr = format_addr(address_bytes)
+        adv = engine.adv(best)
+        engine.reset()
+
+        if self.log:
+            a, b = pack_addr(address_bytes)
+            self.log(EV_SHELLY_PAIRED, a, b)
+        else:
+            print("[shelly] paired", addr)
+
+        self.shelly_addr = addr
+        self._packets.forget(addr)
+        self.storage.save({"shelly_addr": self.shelly_addr})
+        if self.on_shelly:
+            self.on_shelly(addr, adv)
+        self.dispatch(mt.PAIRED)
+        return True
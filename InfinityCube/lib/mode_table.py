@@ -0,0 +1,74 @@
+# mode_table.py
+#
+# Declarative mode table for ModeController: which event moves which
+# mode where, and which BLE resources stay on in every mode. The
+# controller only reconfigures the radio parts that differ between the
+# old and the new mode. Pure Python, also used by tools/mode_sim.py.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+# ---- modes ----
+OFFLINE = 0
+PAIRING = 1
+BUTTON = 2
+REMOTE = 3
+SYNC = 4
+
+# ---- events ----
+LONG_PRESS = 0        # button held 3 s
+PAIRED = 1            # pairing committed a Shelly device
+PAIRING_TIMEOUT = 2   # pairing window over without a candidate
+SYNC_START = 3        # remote asked for SYNC (leader or follower)
+
+# (mode, event) -> next mode; a missing entry ignores the event
+TRANSITIONS = {
+    (OFFLINE, LONG_PRESS): PAIRING,
+    (BUTTON, LONG_PRESS): OFFLINE,
+    (REMOTE, LONG_PRESS): OFFLINE,
+    (SYNC, LONG_PRESS): OFFLINE,
+
+    (PAIRING, PAIRED): BUTTON,
+    (PAIRING, PAIRING_TIMEOUT): REMOTE,
+
+    (OFFLINE, SYNC_START): SYNC,
+    (BUTTON, SYNC_START): SYNC,
+    (REMOTE, SYNC_START): SYNC,
+    (SYNC, SYNC_START): SYNC,     # role change
+}
+
+# ---- radio profile ----
+# Resources that stay on between two update() calls. Scans are not
+# listed: every scan in ModeController is started and stopped inside
+# one update() step.
+RADIO_ADV_REMOTE = 0x01   # advertising remote_adv (UART service)
+RADIO_ADV_SYNC = 0x02     # advertising the sync beacon (leader)
+RADIO_CONNECTED = 0x04    # central connections are kept
+RADIO_ADVERTISING = RADIO_ADV_REMOTE | RADIO_ADV_SYNC
+RADIO_UNKNOWN = 0xFF      # at boot: stop everything, scan included
+
+RADIO = {
+    OFFLINE: 0,
+    PAIRING: 0,
+    BUTTON: 0,
+    REMOTE: RADIO_ADV_REMOTE | RADIO_CONNECTED,
+    SYNC: 0,              # follower, see radio_profile()
+}
+
+
+def next_mode(mode, event):
+    """Target mode for event in mode, None if the event is ignored."""
+    return TRANSITIONS.get((mode, event))
+
+
+def radio_profile(mode, sync_leader=False):
+    if mode == SYNC and sync_leader:
+        return RADIO_ADV_SYNC
+    return RADIO.get(mode, 0)
+
+
+def radio_changes(old, new):
+    """(stop, start) bit masks to go from radio profile old to new."""
+    if old == RADIO_UNKNOWN:
+        return RADIO_UNKNOWN, new
+    return old & ~new, new & ~old
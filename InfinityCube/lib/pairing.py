@@ -0,0 +1,188 @@
+# pairing.py
+#
+# Pairing candidate ranking for PAIRING mode.
+# Every advertisement seen during the pairing window updates a small
+# fixed table of candidates; each is scored by signal strength, Shelly /
+# BTHome signature and repeated sightings, and the best one is committed.
+# Buttons (BTHome button object or "SBBT" name) rank before any other
+# Shelly / BTHome device, and only a button can be committed early, so
+# sensors nearby do not win while the user is still reaching the button.
+# No strings or objects are created per advertisement: addresses are
+# kept as two 24 bit ints, signatures are matched on the raw AD bytes.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+from shelly_ble import NAME_PREFIXES, bthome_has_button
+
+_AD_UUID16_SOME = 0x02
+_AD_UUID16_ALL = 0x03
+_AD_NAME_SHORT = 0x08
+_AD_NAME_COMPLETE = 0x09
+_AD_SERVICE_DATA_16 = 0x16
+_BTHOME_LE = b"\xd2\xfc"
+
+_NAME_PREFIXES = tuple(p.encode() for p in NAME_PREFIXES)
+_BUTTON_NAME = b"SBBT"  # Shelly BLU Button family
+
+# signature bits; advertisement and scan response arrive separately,
+# so the bits of all sightings of a device are ORed together
+SIG_BTHOME = 0x01
+SIG_NAME = 0x02
+SIG_BUTTON = 0x04
+
+
+class PairingEngine:
+    # score = rssi + 100  (0..~70)
+    #       + BTHOME_SCORE if BTHome service data / uuid
+    #       + NAME_SCORE if the name starts with a Shelly prefix
+    #       + BUTTON_SCORE if it is a button
+    #       + REPEAT_SCORE per extra sighting (up to MAX_REPEATS)
+    BTHOME_SCORE = 50
+    NAME_SCORE = 30
+    BUTTON_SCORE = 30
+    REPEAT_SCORE = 10
+    MAX_REPEATS = 5
+
+    def __init__(self, slots=8, *, min_rssi=-90, require_signature=True, commit_score=110):
+        self.slots = slots
+        self.min_rssi = min_rssi
+        self.require_signature = require_signature
+        self.commit_score = commit_score
+
+        self._hi = [0] * slots
+        self._lo = [0] * slots
+        self._rssi = [0] * slots
+        self._seen = [0] * slots
+        self._sig = [0] * slots     # SIG_* bits seen so far
+        self._adv = [None] * slots  # last advertisement, for on_shelly
+        self._used = 0
+
+    def reset(self):
+        for i in range(self._used):
+            self._adv[i] = None
+        self._used = 0
+
+    def __len__(self):
+        return self._used
+
+    # ---- feeding ----
+
+    def observe_adv(self, adv):
+        try:
+            b = adv.address.address_bytes
+        except Exception:
+            return
+        self.observe(b, adv.rssi, adv.data_dict, adv)
+
+    def observe(self, address_bytes, rssi, data_dict, adv=None):
+        if rssi is None or rssi < self.min_rssi:
+            return
+        b = address_bytes
+        hi = (b[5] << 16) | (b[4] << 8) | b[3]
+        lo = (b[2] << 16) | (b[1] << 8) | b[0]
+        sig = self._signature(data_dict)
+
+        for i in range(self._used):
+            if self._lo[i] == lo and self._hi[i] == hi:
+                if rssi > self._rssi[i]:
+                    self._rssi[i] = rssi
+                self._seen[i] += 1
+                self._sig[i] |= sig
+                self._adv[i] = adv
+                return
+
+        if self.require_signature and not sig:
+            return
+
+        i = self._used
+        if i == self.slots:
+            # table full: replace the weakest if the newcomer beats it
+            i = self._worst()
+            if self._score_of(rssi, 1, sig) <= self.score(i):
+                return
+        else:
+            self._used += 1
+
+        self._hi[i] = hi
+        self._lo[i] = lo
+        self._rssi[i] = rssi
+        self._seen[i] = 1
+        self._sig[i] = sig
+        self._adv[i] = adv
+
+    def _signature(self, data_dict):
+        sig = 0
+        sd = data_dict.get(_AD_SERVICE_DATA_16)
+        if sd is not None and len(sd) >= 2 and sd[0] == 0xD2 and sd[1] == 0xFC:
+            sig = SIG_BTHOME
+            if bthome_has_button(sd):
+                sig |= SIG_BUTTON
+        else:
+            for t in (_AD_UUID16_ALL, _AD_UUID16_SOME):
+                u = data_dict.get(t)
+                if u is not None and _BTHOME_LE in u:
+                    sig = SIG_BTHOME
+                    break
+        for t in (_AD_NAME_COMPLETE, _AD_NAME_SHORT):
+            name = data_dict.get(t)
+            if name is not None:
+                if name.startswith(_BUTTON_NAME):
+                    sig |= SIG_BUTTON
+                for p in _NAME_PREFIXES:
+                    if name.startswith(p):
+                        return sig | SIG_NAME
+        return sig
+
+    # ---- ranking ----
+
+    def _score_of(self, rssi, seen, sig):
+        repeats = seen - 1
+        if repeats > self.MAX_REPEATS:
+            repeats = self.MAX_REPEATS
+        score = rssi + 100 + repeats * self.REPEAT_SCORE
+        if sig & SIG_BTHOME:
+            score += self.BTHOME_SCORE
+        if sig & SIG_NAME:
+            score += self.NAME_SCORE
+        if sig & SIG_BUTTON:
+            score += self.BUTTON_SCORE
+        return score
+
+    def score(self, i):
+        return self._score_of(self._rssi[i], self._seen[i], self._sig[i])
+
+    def _worst(self):
+        w = 0
+        for i in range(1, self._used):
+            if self.score(i) < self.score(w):
+                w = i
+        return w
+
+    def best(self):
+        """Index of the best candidate, -1 if none; buttons come first."""
+        b = -1
+        for i in range(self._used):
+            if b < 0:
+                b = i
+                continue
+            button = self._sig[i] & SIG_BUTTON
+            if button != self._sig[b] & SIG_BUTTON:
+                if button:
+                    b = i
+            elif self.score(i) > self.score(b):
+                b = i
+        return b
+
+    def confident(self):
+        """True if the best candidate is a button good enough to commit early."""
+        b = self.best()
+        return b >= 0 and self._sig[b] & SIG_BUTTON and self.score(b) >= self.commit_score
+
+    def address_bytes(self, i):
+        hi = self._hi[i]
+        lo = self._lo[i]
+        return bytes((lo & 0xFF, (lo >> 8) & 0xFF, lo >> 16, hi & 0xFF, (hi >> 8) & 0xFF, hi >> 16))
+
+    def adv(self, i):
+        return self._adv[i]
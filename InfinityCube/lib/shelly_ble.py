@@ -0,0 +1,175 @@
+# shelly_ble.py
+#
+# Shelly BLU address formatting and BTHome v2 packet parsing.
+# Pure Python (no hardware imports): used by ModeController on the cube
+# and by the HomeNodeGateway host daemon.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+BTHOME_UUID = 0xFCD2
+AD_SERVICE_DATA_16 = 0x16
+
+# name prefixes as used in mHomeNodeWeb/homenode.html
+NAME_PREFIXES = ("Shelly", "SBBT")
+
+# BTHome v2 object ids -> (name, size in bytes, signed, factor);
+# unknown ids end parsing (the size of what follows is unknown)
+_OBJECTS = {
+    0x00: ("packet_id", 1, False, 1),
+    0x01: ("battery", 1, False, 1),
+    0x02: ("temperature", 2, True, 0.01),
+    0x03: ("humidity", 2, False, 0.01),
+    0x05: ("illuminance", 3, False, 0.01),
+    0x0C: ("voltage", 2, False, 0.001),
+    0x21: ("motion", 1, False, 1),
+    0x2D: ("window", 1, False, 1),
+    0x2E: ("humidity", 1, False, 1),
+    0x3A: ("button", 1, False, 1),
+    0x3F: ("rotation", 2, True, 0.1),
+    0x45: ("temperature", 2, True, 0.1),
+}
+
+BUTTON_EVENTS = {
+    0x00: "none",
+    0x01: "press",
+    0x02: "double_press",
+    0x03: "triple_press",
+    0x04: "long_press",
+    0x05: "long_double_press",
+    0x06: "long_triple_press",
+    0x80: "hold_press",
+    0xFE: "hold_press",
+}
+
+
+def format_addr(address_bytes):
+    """Address bytes as stored by the cube: lower case, ':' separated."""
+    return ":".join(f"{x:02x}" for x in address_bytes)
+
+
+def addr_to_str(addr_obj):
+    """_bleio.Address -> address string, None if unavailable."""
+    try:
+        return format_addr(addr_obj.address_bytes)
+    except Exception:
+        return None
+
+
+def mac_to_addr(mac):
+    """Printed MAC ("AA:BB:..") -> cube address string.
+
+    _bleio.Address.address_bytes is little-endian, so the cube's string
+    is the printed MAC in reverse byte order.
+    """
+    return format_addr(bytes.fromhex(mac.replace(":", ""))[::-1])
+
+
+def pretty_id(addr):
+    # addr z.B. "aa:bb:cc:dd:ee:ff" -> "DD:EE:FF" als kurze ID
+    if not addr:
+        return None
+    parts = addr.split(":")
+    if len(parts) >= 3:
+        return ":".join(p.upper() for p in parts[-3:])
+    return addr.upper()
+
+
+def is_shelly_name(name):
+    if not name:
+        return False
+    for p in NAME_PREFIXES:
+        if name.startswith(p):
+            return True
+    return False
+
+
+def bthome_payload(service_data_ad):
+    """Raw 0x16 AD structure (uuid + data) -> BTHome payload or None."""
+    if service_data_ad is None or len(service_data_ad) < 3:
+        return None
+    if service_data_ad[0] | (service_data_ad[1] << 8) != BTHOME_UUID:
+        return None
+    return service_data_ad[2:]
+
+
+def bthome_has_button(service_data_ad):
+    """True if a raw 0x16 AD structure (uuid + data) carries an unencrypted
+    BTHome button object. Walks the objects in place, no allocations."""
+    sd = service_data_ad
+    if sd is None or len(sd) < 3 or sd[0] | (sd[1] << 8) != BTHOME_UUID:
+        return False
+    info = sd[2]
+    if info & 0x01 or (info >> 5) != 2:
+        return False
+    i = 3
+    n = len(sd)
+    while i < n:
+        oid = sd[i]
+        if oid == 0x3A:
+            return True
+        obj = _OBJECTS.get(oid)
+        if obj is None:
+            return False
+        i += 1 + obj[1]
+    return False
+
+
+def parse_bthome(payload):
+    """Decode an unencrypted BTHome v2 payload into a dict.
+
+    Returns None for encrypted or non v2 payloads. Multiple button
+    objects are collected in "buttons" (Shelly BLU Button4 etc.).
+    """
+    if not payload:
+        return None
+    info = payload[0]
+    if info & 0x01 or (info >> 5) != 2:
+        return None
+
+    out = {}
+    i = 1
+    n = len(payload)
+    while i < n:
+        obj = _OBJECTS.get(payload[i])
+        if obj is None:
+            break
+        name, size, signed, factor = obj
+        i += 1
+        if i + size > n:
+            break
+        v = 0
+        for k in range(size):
+            v |= payload[i + k] << (8 * k)
+        i += size
+        if signed and v & (1 << (8 * size - 1)):
+            v -= 1 << (8 * size)
+        if factor != 1:
+            v = round(v * factor, 3)
+        if name == "button":
+            out.setdefault("buttons", []).append(v)
+        else:
+            out[name] = v
+    return out
+
+
+class PacketFilter:
+    """Drops the repeats Shelly BLU devices send for every event.
+
+    Remembers the last BTHome packet id per address in a dict, so a
+    press is reported once no matter how many copies are received.
+    """
+
+    def __init__(self):
+        self._last = {}
+
+    def is_new(self, addr, packet_id):
+        if packet_id is None:
+            return True
+        if self._last.get(addr) == packet_id:
+            return False
+        self._last[addr] = packet_id
+        return True
+
+    def forget(self, addr):
+        self._last.pop(addr, None)
@@ -10,10 +10,13 @@ import os
 import storage
 import supervisor
 
+from event_log import EV_STORAGE_SKIP, EV_STORAGE_WRITE
+
 
 class SimpleKVStorage:
-    def __init__(self, path="/settings.toml"):
+    def __init__(self, path="/settings.toml", log=None):
         self.path = path
+        self.log = log  # log(code, a, b), see event_log
 
     def load(self):
         data = {}
@@ -25,7 +28,10 @@ class SimpleKVStorage:
     def save(self, data: dict):
         # --- TEST MODE GUARD ---
         if supervisor.runtime.usb_connected:
-            print("[storage] USB active → skip writing settings.toml")
+            if self.log:
+                self.log(EV_STORAGE_SKIP)
+            else:
+                print("[storage] USB active → skip writing settings.toml")
             return
 
         # --- REAL WRITE (standalone mode) ---
@@ -38,4 +44,6 @@ class SimpleKVStorage:
                     else:
                         f.write(f"{k} = {v}\n")
         finally:
-            storage.remount("/", True)  # RO
\ No newline at end of file
+            storage.remount("/", True)  # RO
+        if self.log:
+            self.log(EV_STORAGE_WRITE, len(data))
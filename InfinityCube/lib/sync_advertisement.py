@@ -0,0 +1,39 @@
+# sync_advertisement.py
+#
+# Manufacturer-data advertisement carrying the cube_sync beacon.
+# Modelled after adafruit_ble.advertising.adafruit.AdafruitColor.
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import struct
+from micropython import const
+
+from adafruit_ble.advertising import Advertisement, LazyObjectField
+from adafruit_ble.advertising.standard import ManufacturerData, ManufacturerDataField
+
+from cube_sync import BEACON_FORMAT, BEACON_FIELDS, ADAFRUIT_COMPANY_ID, SYNC_DATA_ID
+
+_MANUFACTURING_DATA_ADT = const(0xFF)
+
+
+class CubeSyncAdvertisement(Advertisement):
+    """Broadcasts the leader timebase, animation index and color."""
+
+    match_prefixes = (
+        struct.pack(
+            "<BHBH",
+            _MANUFACTURING_DATA_ADT,
+            ADAFRUIT_COMPANY_ID,
+            struct.calcsize("<H" + BEACON_FORMAT[1:]),
+            SYNC_DATA_ID,
+        ),
+    )
+    manufacturer_data = LazyObjectField(
+        ManufacturerData,
+        "manufacturer_data",
+        advertising_data_type=_MANUFACTURING_DATA_ADT,
+        company_id=ADAFRUIT_COMPANY_ID,
+        key_encoding="<H",
+    )
+    beacon = ManufacturerDataField(SYNC_DATA_ID, BEACON_FORMAT, BEACON_FIELDS)
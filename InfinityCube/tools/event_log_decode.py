@@ -0,0 +1,121 @@
+# event_log_decode.py
+#
+# Host-side decoder for the cube's event log (lib/event_log.py).
+# Reads LOG reply frames from the USB serial data port (or a binary
+# capture of it) and prints one line per record.
+#
+# Usage:
+#   python3 event_log_decode.py --serial /dev/ttyACM1            # follow idle exports
+#   python3 event_log_decode.py --serial /dev/ttyACM1 --request  # also ask every second
+#   python3 event_log_decode.py capture.bin
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+import cube_protocol as proto  # noqa: E402
+import event_log as elog  # noqa: E402
+from shelly_ble import format_addr  # noqa: E402
+
+NAMES = {v: k[3:] for k, v in vars(elog).items() if k.startswith("EV_")}
+COLOR_SOURCES = ("button", "remote", "command", "sync")
+
+
+class Decoder:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self._reader = proto.CommandReader(elog.frame_size(255))
+        self._last = None
+        self._base = 0
+
+    def _seconds(self, ticks):
+        # supervisor.ticks_ms() wraps every 2**29 ms (~6.2 days)
+        if self._last is not None and ticks < self._last:
+            self._base += elog.TICKS_PERIOD
+        self._last = ticks
+        return (self._base + ticks) / 1000
+
+    def feed(self, stream):
+        while self._reader.poll(stream) == proto.CommandReader.COMMAND:
+            if self._reader.cmd != proto.LOG | proto.REPLY:
+                continue
+            dropped, records = elog.decode_records(self._reader.payload)
+            if dropped:
+                print(f"{'':>12}  ({dropped} records overwritten before export)", file=self.out)
+            for ticks, code, a, b in records:
+                print(f"{self._seconds(ticks):12.3f}  {format_record(code, a, b)}", file=self.out)
+
+
+def format_record(code, a, b):
+    name = NAMES.get(code, f"EVENT_{code}")
+    if code == elog.EV_COLOR:
+        src = COLOR_SOURCES[a] if a < len(COLOR_SOURCES) else a
+        return f"{name:<14} #{b:06X} ({src})"
+    if code == elog.EV_STREAM_STATS:
+        return f"{name:<14} {a / 10:.1f} fps, dropped {b}"
+    if code == elog.EV_SHELLY_PAIRED:
+        return f"{name:<14} {format_addr(elog.unpack_addr(a, b))}"
+    if code == elog.EV_SHELLY_EVENT:
+        pid = "?" if a == 0xFFFF else a
+        return f"{name:<14} packet {pid}, button {b}"
+    return f"{name:<14} {a} {b}"
+
+
+class _FileStream:
+    def __init__(self, f):
+        self._f = f
+
+    @property
+    def in_waiting(self):
+        return 4096
+
+    def readinto(self, buf):
+        return self._f.readinto(buf)
+
+
+def follow_serial(port, request, decoder):
+    import serial
+
+    with serial.Serial(port, 115200, timeout=0.1) as link:
+        next_request = 0.0
+        while True:
+            now = time.monotonic()
+            if request and now >= next_request:
+                next_request = now + 1.0
+                link.write(proto.encode(proto.LOG))
+            decoder.feed(link)
+            time.sleep(0.02)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Decode the InfinityCube event log")
+    ap.add_argument("capture", nargs="?", help="binary capture of the data port")
+    ap.add_argument("--serial", help="USB serial data port of the cube")
+    ap.add_argument("--request", action="store_true", help="send a LOG command every second")
+    args = ap.parse_args()
+
+    decoder = Decoder()
+    try:
+        if args.serial:
+            follow_serial(args.serial, args.request, decoder)
+        elif args.capture:
+            with open(args.capture, "rb") as f:
+                stream = _FileStream(f)
+                before = -1
+                while before != f.tell():
+                    before = f.tell()
+                    decoder.feed(stream)
+        else:
+            ap.error("capture file or --serial required")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# frame_sender.py
+#
+# Host-side sender for the cube's live frame stream (STREAM command).
+# Frames come from a built-in pattern or a raw RGB file / pipe
+# (e.g. ffmpeg -f rawvideo -pix_fmt rgb24 -s 132x1 -), are encoded as
+# RAW, RLE or DELTA (whichever is smallest, key frame every N frames)
+# and sent over USB serial (pyserial) or the BLE UART (bleak).
+# The cube answers once per second with the FPS it achieved.
+#
+# Usage:
+#   python3 frame_sender.py --serial /dev/ttyACM1 --pattern rainbow --fps 60
+#   ffmpeg ... | python3 frame_sender.py --ble AA:BB:CC:DD:EE:FF --input -
+#   python3 frame_sender.py --dry-run --pattern plasma
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+import cube_protocol as proto  # noqa: E402
+from frame_stream import FrameStream, RAW, RLE, DELTA  # noqa: E402
+
+PIXELS = 132
+NUS_RX = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"  # host -> cube
+NUS_TX = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"  # cube -> host
+
+
+# -----------------------------------------------------------------------------
+# Encoding
+# -----------------------------------------------------------------------------
+
+def encode_rle(frame, bpp=3):
+    out = bytearray()
+    n = len(frame)
+    j = 0
+    while j < n:
+        px = frame[j:j + bpp]
+        count = 1
+        k = j + bpp
+        while count < 255 and k < n and frame[k:k + bpp] == px:
+            count += 1
+            k += bpp
+        out.append(count)
+        out += px
+        j = k
+    return bytes(out)
+
+
+def encode_delta(prev, frame, bpp=3):
+    out = bytearray()
+    pixels = len(frame) // bpp
+    i = 0
+    skip = 0
+    while i < pixels:
+        a = i * bpp
+        if frame[a:a + bpp] == prev[a:a + bpp]:
+            skip += 1
+            i += 1
+            continue
+        while skip > 255:
+            out += bytes((255, 0))
+            skip -= 255
+        start = i
+        while i < pixels and i - start < 255:
+            a = i * bpp
+            if frame[a:a + bpp] == prev[a:a + bpp]:
+                break
+            i += 1
+        out += bytes((skip, i - start))
+        out += frame[start * bpp:i * bpp]
+        skip = 0
+    return bytes(out)
+
+
+class FrameEncoder:
+    """Builds STREAM payloads, picking the smallest encoding per frame."""
+
+    def __init__(self, bpp=3, keyframe_every=30):
+        self.bpp = bpp
+        self.keyframe_every = keyframe_every
+        self.seq = 0
+        self._prev = None
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+
+    def encode(self, frame):
+        candidates = [(RAW, frame), (RLE, encode_rle(frame, self.bpp))]
+        if self._prev is not None and self.seq % self.keyframe_every:
+            candidates.append((DELTA, encode_delta(self._prev, frame, self.bpp)))
+        enc, data = min(candidates, key=lambda c: len(c[1]))
+
+        payload = bytes((self.seq & 0xFF, (self.seq >> 8) & 0xFF, enc)) + data
+        self.seq = (self.seq + 1) & 0xFFFF
+        self._prev = frame
+        self.bytes_raw += len(frame)
+        self.bytes_sent += len(payload)
+        return proto.encode(proto.STREAM, payload)
+
+
+# -----------------------------------------------------------------------------
+# Frame sources
+# -----------------------------------------------------------------------------
+
+def reorder(rgb, order, brightness):
+    """RGB bytes -> strip byte order, brightness applied (cube sends as is)."""
+    idx = ["RGB".index(c) for c in order]
+    out = bytearray(len(rgb))
+    scale = brightness
+    for p in range(0, len(rgb), 3):
+        for k, i in enumerate(idx):
+            out[p + k] = int(rgb[p + i] * scale)
+    return bytes(out)
+
+
+def pattern_frames(name, pixels):
+    t0 = time.monotonic()
+    while True:
+        t = time.monotonic() - t0
+        frame = bytearray(pixels * 3)
+        for i in range(pixels):
+            if name == "rainbow":
+                h = (i / pixels + t * 0.2) % 1.0
+                r, g, b = _hue(h)
+            elif name == "plasma":
+                v = math.sin(i * 0.15 + t * 3) + math.sin(i * 0.05 - t * 2)
+                r, g, b = _hue((v + 2) / 4)
+            else:  # "chase": mostly dark, good case for DELTA / RLE
+                on = int(t * 30) % pixels
+                r, g, b = (255, 255, 255) if i == on else (0, 0, 0)
+            frame[i * 3:i * 3 + 3] = bytes((r, g, b))
+        yield bytes(frame)
+
+
+def _hue(h):
+    h6 = h * 6
+    x = int(255 * (1 - abs(h6 % 2 - 1)))
+    return [(255, x, 0), (x, 255, 0), (0, 255, x), (0, x, 255), (x, 0, 255), (255, 0, x)][int(h6) % 6]
+
+
+def file_frames(path, pixels):
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    size = pixels * 3
+    while True:
+        frame = f.read(size)
+        if len(frame) < size:
+            return
+        yield frame
+
+
+# -----------------------------------------------------------------------------
+# Links
+# -----------------------------------------------------------------------------
+
+class StatsReader:
+    def __init__(self):
+        self._reader = proto.CommandReader(256)
+
+    def poll(self, stream):
+        while self._reader.poll(stream) == proto.CommandReader.COMMAND:
+            if self._reader.cmd == proto.STREAM | proto.REPLY:
+                seq, fps, dropped, lost = proto.decode_stream_stats(self._reader.payload)
+                print(f"cube: {fps:5.1f} fps  seq {seq}  dropped {dropped}  lost {lost}")
+
+
+class _Buffer:
+    """Collects BLE notifications so StatsReader can poll them."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.data))
+        buf[:n] = self.data[:n]
+        del self.data[:n]
+        return n
+
+
+def run_serial(frames, encoder, port, fps):
+    import serial
+
+    stats = StatsReader()
+    with serial.Serial(port, 115200, timeout=0) as link:
+        pace(frames, encoder, fps, link.write, lambda: stats.poll(link))
+
+
+async def run_ble(frames, encoder, address, fps):
+    from bleak import BleakClient
+
+    stats = StatsReader()
+    rx = _Buffer()
+    async with BleakClient(address) as client:
+        await client.start_notify(NUS_TX, lambda _, data: rx.data.extend(data))
+        chunk = max(20, client.mtu_size - 3)
+        period = 1.0 / fps
+        next_t = time.monotonic()
+        for frame in frames:
+            data = encoder.encode(frame)
+            for i in range(0, len(data), chunk):
+                await client.write_gatt_char(NUS_RX, data[i:i + chunk], response=False)
+            stats.poll(rx)
+            next_t += period
+            await asyncio.sleep(max(0.0, next_t - time.monotonic()))
+
+
+def pace(frames, encoder, fps, write, poll):
+    period = 1.0 / fps
+    next_t = time.monotonic()
+    for frame in frames:
+        write(encoder.encode(frame))
+        poll()
+        next_t += period
+        delay = next_t - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_t = time.monotonic()  # link too slow, the cube drops oldest anyway
+
+
+def dry_run(frames, encoder, pixels, count):
+    """Encode, decode with the cube's FrameStream and compare."""
+    shown = []
+    sink = FrameStream(pixels, 3, write=lambda buf: shown.append(bytes(buf)))
+    reader = proto.CommandReader(pixels * 3 + 16)
+    rx = _Buffer()
+    for n, frame in enumerate(frames):
+        if n >= count:
+            break
+        rx.data.extend(encoder.encode(frame))
+        while reader.poll(rx) == proto.CommandReader.COMMAND:
+            sink.receive(reader.payload, n)
+        sink.show(n)
+        if shown[-1] != frame:
+            print("mismatch at frame", n)
+            return
+    ratio = encoder.bytes_sent / max(1, encoder.bytes_raw)
+    print(f"{count} frames ok, {encoder.bytes_sent} of {encoder.bytes_raw} bytes ({ratio * 100:.0f} %)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream frames to an InfinityCube")
+    link = ap.add_mutually_exclusive_group(required=True)
+    link.add_argument("--serial", help="USB serial data port of the cube")
+    link.add_argument("--ble", help="BLE address of the cube (REMOTE mode)")
+    link.add_argument("--dry-run", action="store_true", help="encode/decode only, print compression")
+    ap.add_argument("--pattern", choices=("rainbow", "plasma", "chase"), default="rainbow")
+    ap.add_argument("--input", help="raw RGB frames (pixels * 3 bytes each), '-' for stdin")
+    ap.add_argument("--pixels", type=int, default=PIXELS)
+    ap.add_argument("--fps", type=float, default=30.0)
+    ap.add_argument("--order", default="GRB", help="strip byte order")
+    ap.add_argument("--brightness", type=float, default=0.5)
+    ap.add_argument("--keyframe", type=int, default=30, help="key frame every N frames")
+    args = ap.parse_args()
+
+    src = file_frames(args.input, args.pixels) if args.input else pattern_frames(args.pattern, args.pixels)
+    frames = (reorder(f, args.order, args.brightness) for f in src)
+    encoder = FrameEncoder(keyframe_every=args.keyframe)
+
+    try:
+        if args.dry_run:
+            dry_run(frames, encoder, args.pixels, int(args.fps * 10))
+        elif args.serial:
+            run_serial(frames, encoder, args.serial, args.fps)
+        else:
+            asyncio.run(run_ble(frames, encoder, args.ble, args.fps))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
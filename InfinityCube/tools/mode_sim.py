@@ -0,0 +1,226 @@
+# mode_sim.py
+#
+# Host simulation of ModeController mode switches.
+# Runs the real controller (lib/mode_controller.py) against a fake BLE
+# radio that counts every call and charges it an assumed cost, walking
+# the transition table of lib/mode_table.py at random. The run compares
+# the minimal radio reconfiguration with the old "stop everything, then
+# start" mode switch and prints the latency per transition.
+#
+# Costs are assumptions, not measurements: time the calls on the board
+# and pass them with --cost (e.g. --cost disconnect_all_connections=45).
+#
+# Usage: python3 mode_sim.py [--steps 2000] [--seed 1] [--cost call=ms ...]
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import os
+import random
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+try:
+    from adafruit_ble.advertising import Advertisement  # noqa: F401
+except ImportError:
+    # the simulator never builds real advertisements: a bare stand-in
+    # is enough for mode_controller's scan filter argument
+    _ble = types.ModuleType("adafruit_ble")
+    _adv = types.ModuleType("adafruit_ble.advertising")
+    _adv.Advertisement = type("Advertisement", (), {})
+    _ble.advertising = _adv
+    sys.modules["adafruit_ble"] = _ble
+    sys.modules["adafruit_ble.advertising"] = _adv
+
+import mode_controller  # noqa: E402
+import mode_table as mt  # noqa: E402
+from mode_controller import ModeController  # noqa: E402
+
+# assumed cost of one call in ms
+COSTS = {
+    "stop_scan": 1.0,
+    "stop_advertising": 1.5,
+    "start_advertising": 4.0,
+    "connected": 0.1,
+    "disconnect_all_connections": 30.0,
+    "start_scan": 1.0,
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeAddress:
+    def __init__(self, address_bytes):
+        self.address_bytes = address_bytes
+
+
+class FakeAdv:
+    """Shelly BLU Button advertisement as seen by the pairing scan."""
+
+    def __init__(self):
+        self.address = FakeAddress(bytes((0x11, 0x22, 0x33, 0x44, 0x55, 0x66)))
+        self.rssi = -50
+        self.data_dict = {0x16: b"\xd2\xfc\x44\x00\x01\x3a\x01", 0x09: b"SBBT-002C"}
+
+
+class FakeBLE:
+    def __init__(self, costs):
+        self.costs = costs
+        self.calls = {}
+        self.spent_ms = 0.0
+        self.link = False
+        self.results = ()
+
+    def _charge(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.spent_ms += self.costs[name]
+
+    @property
+    def connected(self):
+        self._charge("connected")
+        return self.link
+
+    def disconnect_all_connections(self):
+        self._charge("disconnect_all_connections")
+        self.link = False
+
+    def start_advertising(self, adv, interval=None):
+        self._charge("start_advertising")
+
+    def stop_advertising(self):
+        self._charge("stop_advertising")
+
+    def start_scan(self, *types_, **kwargs):
+        self._charge("start_scan")
+        results, self.results = self.results, ()
+        return iter(results)
+
+    def stop_scan(self):
+        self._charge("stop_scan")
+
+
+class Storage:
+    def load(self):
+        return {}
+
+    def save(self, data):
+        pass
+
+
+class FullResetController(ModeController):
+    """Old mode switch: stop scan, advertising and connections every time."""
+
+    def _reconfigure(self, radio):
+        self._radio = mt.RADIO_UNKNOWN
+        super()._reconfigure(radio)
+
+
+class Stats:
+    def __init__(self):
+        self.rows = {}   # (from, to) -> [count, calls, ms]
+
+    def add(self, key, calls, ms):
+        row = self.rows.setdefault(key, [0, 0, 0.0])
+        row[0] += 1
+        row[1] += calls
+        row[2] += ms
+
+
+def run(cls, steps, seed, costs):
+    """Random walk over the transition table; returns Stats of mode switches."""
+    rnd = random.Random(seed)
+    clock = Clock()
+    mode_controller.time = clock
+    ble = FakeBLE(costs)
+    stats = Stats()
+    mark = {}
+
+    def on_mode(mode):
+        # everything charged since the switch started belongs to it
+        calls = sum(ble.calls.values()) - mark["calls"]
+        stats.add((mark["mode"], mode), calls, ble.spent_ms - mark["ms"])
+
+    modes = cls(
+        ble=ble, storage=Storage(), remote_adv=object(), sync_adv=object(),
+        pairing_s=10.0, on_mode=on_mode, log=lambda code, a=0, b=0: None,
+    )
+    set_mode = modes._set_mode
+
+    def probe(m):
+        mark["mode"] = modes.mode
+        mark["calls"] = sum(ble.calls.values())
+        mark["ms"] = ble.spent_ms
+        set_mode(m)
+
+    modes._set_mode = probe
+
+    for _ in range(steps):
+        clock.now += 1.0
+        if modes.mode == mt.REMOTE:
+            # the Bluefruit app usually connects while in REMOTE
+            ble.link = rnd.random() < 0.7
+
+        if modes.mode == mt.PAIRING:
+            if rnd.random() < 0.5:
+                ble.results = (FakeAdv(),)       # -> PAIRED (confident)
+            else:
+                clock.now += modes.pairing_s     # -> PAIRING_TIMEOUT
+            modes.update()
+            continue
+
+        events = [e for (m, e) in mt.TRANSITIONS if m == modes.mode]
+        event = rnd.choice(events)
+        if event == mt.SYNC_START:
+            modes.enter_sync(leader=rnd.random() < 0.5)
+        else:
+            modes.dispatch(event)
+        modes.update()
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulate ModeController mode switch latency")
+    ap.add_argument("--steps", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--cost", action="append", default=[], metavar="CALL=MS",
+                    help="override the assumed cost of a BLE call")
+    args = ap.parse_args()
+
+    costs = dict(COSTS)
+    for item in args.cost:
+        name, _, ms = item.partition("=")
+        if name not in costs:
+            ap.error(f"unknown call {name!r}, known: {', '.join(costs)}")
+        costs[name] = float(ms)
+
+    full = run(FullResetController, args.steps, args.seed, costs)
+    minimal = run(ModeController, args.steps, args.seed, costs)
+
+    name = ModeController.MODE_NAMES.get
+    print(f"{'transition':<20} {'count':>6}  {'full reset':>18}  {'minimal':>18}")
+    totals = [0, 0.0, 0.0]
+    for key in sorted(full.rows):
+        n, f_calls, f_ms = full.rows[key]
+        _, m_calls, m_ms = minimal.rows.get(key, (0, 0, 0.0))
+        totals[0] += n
+        totals[1] += f_ms
+        totals[2] += m_ms
+        label = f"{name(key[0])} -> {name(key[1])}"
+        print(f"{label:<20} {n:>6}  {f_calls / n:5.1f} calls {f_ms / n:5.1f} ms"
+              f"  {m_calls / n:5.1f} calls {m_ms / n:5.1f} ms")
+    if totals[0]:
+        print(f"\n{totals[0]} switches, mean radio time {totals[1] / totals[0]:.2f} ms "
+              f"-> {totals[2] / totals[0]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# sync_sim.py
+#
+# Host simulation of the SYNC mode with N virtual cubes.
+# Each cube has its own crystal drift and boot time. The run compares
+# free-running frame clocks with followers phase-locked to a leader beacon
+# using the same cube_sync code as the firmware. The sync spread is the
+# difference in animation position, i.e. frames each cube actually drew
+# (plus the skipped frames code.py fast-forwards) since its last restart.
+#
+# Usage: python3 sync_sim.py [--cubes 8] [--minutes 10] [--ppm 40] [--no-fast-forward]
+#
+# (c) 2025 Stephan Zehrer
+# SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+
+from cube_sync import SyncClock, FrameLock, pack_beacon, unpack_beacon  # noqa: E402
+
+# same timing as ModeController / code.py
+FRAME_MS = 50            # COMET_SPEED
+ADV_INTERVAL_MS = 50     # SYNC_ADV_INTERVAL_S
+REFRESH_MS = 250         # SYNC_REFRESH_S
+LISTEN_MS = 1000         # SYNC_LISTEN_S
+SCAN_WINDOW_MS = 30      # SYNC_SCAN_WINDOW_S
+SCAN_TIMEOUT_MS = 60     # SYNC_SCAN_TIMEOUT_S
+LOOP_MS = (3, 12)        # duration of one main loop pass
+
+
+class VirtualCube:
+    """One cube: drifting crystal, jittery main loop, two frame clocks.
+
+    free:   adafruit_led_animation style, next frame = now + speed,
+            so loop latency accumulates into drift
+    synced: FrameLock driven by the SyncClock, as in code.py SYNC mode;
+            position counts the frames drawn since the last restart
+    """
+
+    def __init__(self, rnd, ppm, leader, fast_forward=True):
+        self.rnd = rnd
+        self.leader = leader
+        self.fast_forward = fast_forward
+        self.rate = 1.0 + rnd.uniform(-ppm, ppm) * 1e-6
+        self.boot = rnd.uniform(0, 5000)       # true ms at power-on
+        self.clock = SyncClock(latency_ms=REFRESH_MS // 4)
+        self.lock = FrameLock(FRAME_MS)
+        self.position = 0
+        self.free_frames = 0
+        self.free_next = 0
+        self.next_loop = 0
+        self.next_listen = rnd.uniform(0, LISTEN_MS)
+        self.scan_ms = 0
+        self.beacons = 0
+
+    def local_ms(self, t):
+        return int((t - self.boot) * self.rate)
+
+    def start(self, t):
+        self.free_next = self.local_ms(t)
+        self.next_loop = t
+
+    def loop(self, t, beacon):
+        lt = self.local_ms(t)
+        busy = self.rnd.uniform(*LOOP_MS)
+
+        if not self.leader and t >= self.next_listen:
+            self.next_listen = t + LISTEN_MS * self.rnd.uniform(0.5, 1.5)
+            self.scan_ms += SCAN_TIMEOUT_MS
+            busy += SCAN_TIMEOUT_MS
+            # an advertising event has to land inside the short scan window
+            heard = t + self.rnd.uniform(0, ADV_INTERVAL_MS)
+            if heard - t <= SCAN_WINDOW_MS:
+                leader_ms, anim_start, _, _, _, _, _ = unpack_beacon(beacon)
+                self.clock.observe(leader_ms, self.local_ms(heard))
+                if not self.beacons or anim_start != self.lock.start_ms:
+                    self.lock.restart(anim_start)
+                    self.position = 0
+                self.beacons += 1
+
+        if lt >= self.free_next:
+            self.free_frames += 1
+            self.free_next = lt + FRAME_MS
+        if self.leader or self.beacons:
+            self.position += self.lock.frames_due(self.clock.now(lt))
+            skipped = self.lock.take_skipped()
+            if self.fast_forward:
+                self.position += skipped
+
+        self.next_loop = t + busy
+
+
+def spread(values):
+    return max(values) - min(values)
+
+
+def run(cubes, minutes, ppm, seed, fast_forward=True):
+    rnd = random.Random(seed)
+    fleet = [VirtualCube(rnd, ppm, i == 0, fast_forward) for i in range(cubes)]
+    leader = fleet[0]
+
+    # all cubes switched on, first frame drawn together
+    t = max(c.boot for c in fleet)
+    for c in fleet:
+        c.start(t)
+    leader.lock.restart(leader.local_ms(t))
+
+    beacon = None
+    beacon_t = None
+    seq = 0
+    end = t + minutes * 60000
+    report_every = max(1000, int(minutes * 6000))
+    next_report = t + report_every
+    worst_free = worst_sync = 0
+
+    print(f"{cubes} cubes, +/-{ppm:g} ppm, frame {FRAME_MS} ms, loop {LOOP_MS[0]}..{LOOP_MS[1]} ms")
+    print(f"{'t [s]':>7} {'free spread':>12} {'sync spread':>12}   frames, worst in interval")
+
+    t0 = t
+    while t < end:
+        # the leader refreshes its beacon (ModeController._broadcast_sync)
+        if beacon_t is None or t - beacon_t >= REFRESH_MS:
+            seq = (seq + 1) & 0xFF
+            beacon = pack_beacon(leader.local_ms(t), leader.lock.start_ms, seq, 1, (0, 200, 150))
+            beacon_t = t
+
+        for c in fleet:
+            if t >= c.next_loop:
+                c.loop(t, beacon)
+
+        worst_free = max(worst_free, spread([c.free_frames for c in fleet]))
+        if all(c.leader or c.beacons for c in fleet):
+            worst_sync = max(worst_sync, spread([c.position for c in fleet]))
+
+        if t >= next_report:
+            print(f"{(t - t0) / 1000:7.0f} {worst_free:12d} {worst_sync:12d}")
+            worst_free = worst_sync = 0
+            next_report += report_every
+        t += 1
+
+    followers = [c for c in fleet if not c.leader]
+    if followers:
+        duty = sum(c.scan_ms for c in followers) / len(followers) / (end - t0)
+        print(f"follower main loop time spent scanning: {duty * 100:.1f} %")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cubes", type=int, default=8)
+    ap.add_argument("--minutes", type=float, default=10)
+    ap.add_argument("--ppm", type=float, default=40.0, help="max crystal drift per cube")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--no-fast-forward", action="store_true",
+                    help="do not step over skipped frames (shows the phase error it fixes)")
+    args = ap.parse_args()
+    run(args.cubes, args.minutes, args.ppm, args.seed, not args.no_fast_forward)
+
+
+if __name__ == "__main__":
+    main()